@@ -1,12 +1,32 @@
 import discord
 from discord.ext import commands
-import requests
 import logging
+import math
 import os
 import asyncio
 from dotenv import load_dotenv
-from flask import Flask, send_file
+from flask import Flask, Response, abort, g, jsonify, request
 import threading
+import time
+from aiohttp import web
+from leaderboard import (
+    LEADERBOARD_POLL_INTERVAL, LEADERBOARD_TTL, LeaderboardCache, LeaderboardClient, LeaderboardError,
+    LeaderboardFormatError, poll_leaderboard,
+)
+from history import HistoryStore
+from live import LiveHub
+import metrics
+from servers import ServerRegistry
+from outbound import Outbox
+from persist import SnapshotStore
+import cluster
+from probe import PROBE_INTERVAL, LatencyProber, probe_forever
+from render import Renderer, discord_safe, server_path
+from search import NickIndex
+from selection import SelectionStore
+from shared import SharedSnapshot, SharedSnapshotClient, follow_shared_snapshots
+from watch import WatchError, WatchManager
+from httputil import Page, RequestStats, conditional_response
 
 # Load environment variables from .env file (for local testing)
 load_dotenv()
@@ -18,11 +38,68 @@ logger = logging.getLogger('SlitherBot')
 intents = discord.Intents.default()
 intents.message_content = True
 
-bot = commands.Bot(command_prefix="", intents=intents)
+# "cluster" runs sharded bot processes, web processes and one upstream fetcher (see cluster.py)
+DEPLOY_MODE = os.getenv("DEPLOY_MODE", "single").lower()
+# Set by cluster.py for its worker processes
+SNAPSHOT_SHM = os.getenv("SNAPSHOT_SHM")  # Shared snapshot segment to follow instead of polling upstream
+SHARD_IDS = [int(shard) for shard in os.getenv("SHARD_IDS", "").split(",") if shard]
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Bot process port for /metrics and /stats, 0 disables
+
+
+class SlitherBot(commands.AutoShardedBot if SHARD_IDS else commands.Bot):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if SNAPSHOT_SHM:
+            # Cluster worker: the fetcher process polls upstream and every publish refreshes this cache
+            self.leaderboard = SharedSnapshotClient(SharedSnapshot.attach(SNAPSHOT_SHM))
+            self.leaderboard_cache = LeaderboardCache(self.leaderboard, ttl=float("inf"))
+        else:
+            self.leaderboard = LeaderboardClient()
+            self.leaderboard_cache = LeaderboardCache(self.leaderboard)
+        self.prober = LatencyProber()
+        self.background_tasks = []
+
+    async def setup_hook(self):
+        # Create the pooled HTTP session on the bot's own event loop
+        await self.leaderboard.start()
+        self.start_background_tasks()
+
+    def start_background_tasks(self, probes=True):
+        if SNAPSHOT_SHM:
+            self.background_tasks.append(asyncio.create_task(follow_shared_snapshots(self.leaderboard_cache, self.leaderboard)))
+        elif LEADERBOARD_POLL_INTERVAL > 0:
+            # One shared upstream poll feeds live viewers and every other snapshot consumer
+            self.background_tasks.append(asyncio.create_task(poll_leaderboard(self.leaderboard_cache)))
+        if probes and PROBE_INTERVAL > 0:
+            self.background_tasks.append(asyncio.create_task(probe_forever(self.prober, registry.all_servers())))
+        if metrics.LOOP_LAG_INTERVAL > 0:
+            self.background_tasks.append(asyncio.create_task(metrics.watch_loop_lag()))
+
+    async def close(self):
+        for task in self.background_tasks:
+            task.cancel()
+        await self.leaderboard.close()
+        await super().close()
+
+
+bot = SlitherBot(command_prefix="", intents=intents,
+                 **({"shard_ids": SHARD_IDS, "shard_count": SHARD_COUNT} if SHARD_IDS else {}))
+
+# Server-Sent Events fan-out of each polled snapshot to browser viewers
+live_hub = LiveHub(bot.leaderboard_cache)
 
 # Flask app setup
 app = Flask(__name__, static_folder='static', static_url_path='/static')
 
+# "aiohttp" serves the site on the bot's event loop; "flask" keeps the Werkzeug server in a thread
+WEB_MODE = os.getenv("WEB_MODE", "aiohttp").lower()
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+LIVE_PAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates", "bot.html")
+
+# Request counters for whichever frontend is running
+web_stats = RequestStats()
+
 # Country to IP mapping with approximate coordinates for map and server numbers
 country_to_ip = {
     # Africa
@@ -239,249 +316,642 @@ country_to_ip = {
     ],
 }
 
-# Store user's last selected country to handle server selection
-user_selection = {}
+# Resolved once at startup; raises ValueError on broken aliases or duplicate servers
+registry = ServerRegistry(country_to_ip)
+
+# Static map fragment and page shell are compiled once from the registry
+renderer = Renderer(registry)
+
+# All replies go through the outbound queue so bursts stay inside Discord's rate limits
+outbox = Outbox()
+
+# Self-updating pinned leaderboards, refreshed by the shared poller
+watches = WatchManager(bot.leaderboard_cache, renderer, outbox)
+
+# Ring-buffered score history for every registry server, fed by the poller
+history = HistoryStore(bot.leaderboard_cache, (server.key for server in registry.all_servers()))
+HISTORY_COMMAND_WINDOW = 24 * 3600
+HISTORY_COMMAND_BUCKETS = 12
+HISTORY_MAX_BUCKETS = 500
+
+# Nickname -> (server, place, len) index across every server, updated from snapshot diffs
+nick_index = NickIndex(bot.leaderboard_cache)
+FIND_LIMIT = 10
+BEST_LIMIT = 5
+
+# Recent snapshots and the latest page on disk, so a restart serves immediately
+snapshot_store = SnapshotStore()
+if not SNAPSHOT_SHM:  # In a cluster only the fetcher process writes snapshots
+    bot.leaderboard_cache.add_listener(lambda old, new: snapshot_store.save_snapshot(new))
+
+# Store user's last selected country to handle server selection (bounded LRU with idle expiry)
+user_selection = SelectionStore()
 
 # Global variable to store the latest bot.html content
 latest_html_content = None
 
+NO_MAP_HTML = "<h1>No map data available</h1><p>Please use the bot to generate a map first.</p>"
+
 @bot.event
 async def on_ready():
     logger.info(f"Logged in as {bot.user}")
 
-@bot.event
-async def on_message(message):
-    global latest_html_content
-    if message.author.bot:
-        return
+def build_server_list_message():
+    msg = "**Available Server Countries**\n"
+    msg += "```\n"
+    for idx, country in enumerate(registry.countries, 1):
+        msg += f"{idx}. {country.capitalize()}\n"
+    msg += "```\n"
+    msg += "Use `#server <country>` to see servers in a specific country (e.g., `#server mumbai`)."
+    return msg
+
+def build_country_message(country):
+    msg = f"**Available Servers in {country.capitalize()}**\n"
+    msg += "```\n"
+    for server in registry.servers(country):
+        msg += f"{server.index}. {server.ip}:{server.port} ({server.number})\n"
+    msg += "```\n"
+    msg += "Type `#select <number>` to choose a server by index (e.g., `#select 1`) or by server number (e.g., `#select 8828`)."
+    return msg
+
+# The registry never changes at runtime, so these replies are built once
+SERVER_LIST_MESSAGE = build_server_list_message()
+COUNTRY_MESSAGES = {country: build_country_message(country) for country in registry.countries}
+
+async def handle_server(message, args):
+    content = args.strip().lower()
 
     # Command: #server list
-    if message.content.lower() == "#server list":
-        try:
-            logger.info("Received command: #server list")
-            countries = [key for key in country_to_ip.keys() if not isinstance(country_to_ip[key], str)]  # Exclude aliases
-            if not countries:
-                await message.channel.send("No servers available.")
-                return
-
-            msg = "**Available Server Countries**\n"
-            msg += "```\n"
-            for idx, country in enumerate(countries, 1):
-                msg += f"{idx}. {country.capitalize()}\n"
-            msg += "```\n"
-            msg += "Use `#server <country>` to see servers in a specific country (e.g., `#server mumbai`)."
-            await message.channel.send(msg)
-            return
-        except Exception as e:
-            logger.error(f"Unexpected error in #server list: {str(e)}")
-            await message.channel.send(f"Error: {str(e)}")
+    if content == "list":
+        logger.info("Received command: #server list")
+        if not registry.countries:
+            await outbox.send(message.channel, "No servers available.")
             return
+        await outbox.send(message.channel, SERVER_LIST_MESSAGE)
+        return
 
-    if message.content.startswith("#server "):
-        try:
-            content = message.content.split("#server ")[1].strip().lower()
-            logger.info(f"Received command: #server {content}")
-
-            # Handle country aliases (e.g., "ind" -> "mumbai")
-            country_key = country_to_ip.get(content)
-            if isinstance(country_key, str):
-                content = country_key
-                country_key = country_to_ip[content]
-
-            if content not in country_to_ip or not isinstance(country_key, list):
-                await message.channel.send("Country not found. Use format `#server country` (e.g., `#server mumbai` or `#server ind`). Use `#server list` to see all countries.")
-                return
-
-            # Show list of servers for the country
-            servers = country_to_ip[content]
-            msg = f"**Available Servers in {content.capitalize()}**\n"
-            msg += "```\n"
-            for idx, server in enumerate(servers, 1):
-                msg += f"{idx}. {server['ip']}:{server['port']} ({server['number']})\n"
-            msg += "```\n"
-            msg += "Type `#select <number>` to choose a server by index (e.g., `#select 1`) or by server number (e.g., `#select 8828`)."
-            await message.channel.send(msg)
-
-            # Store the user's selected country for the next command
-            user_selection[message.author.id] = {"country": content, "servers": servers}
-            return
+    logger.info(f"Received command: #server {content}")
 
-        except Exception as e:
-            logger.error(f"Unexpected error in #server: {str(e)}")
-            await message.channel.send(f"Error: {str(e)}")
-            return
+    # Handle country aliases (e.g., "ind" -> "mumbai")
+    country = registry.resolve(content)
+    if country is None:
+        await outbox.send(message.channel, "Country not found. Use format `#server country` (e.g., `#server mumbai` or `#server ind`). Use `#server list` to see all countries.")
+        return
 
-    if message.content.startswith("#select "):
-        try:
-            user_id = message.author.id
-            if user_id not in user_selection:
-                await message.channel.send("Please run `#server <country>` first to select a country.")
-                return
-
-            selection = message.content.split("#select ")[1].strip()
-            selected_data = user_selection[user_id]
-            country = selected_data["country"]
-            servers = selected_data["servers"]
-
-            # Check if selection is a server number or an index
-            selected_server = None
-            if selection.isdigit():
-                selection_num = selection
-                # Try to match by server number
-                for server in servers:
-                    if server["number"] == selection_num:
-                        selected_server = server
-                        break
-
-                # If no match by server number, try by index
-                if not selected_server:
-                    selection_idx = int(selection) - 1
-                    if selection_idx < 0 or selection_idx >= len(servers):
-                        await message.channel.send(f"Please select a number between 1 and {len(servers)} or a valid server number.")
-                        return
-                    selected_server = servers[selection_idx]
-            else:
-                await message.channel.send("Please enter a valid number (e.g., `#select 1` or `#select 8828`).")
-                return
-
-            ip = selected_server["ip"]
-            port = selected_server["port"]
-            server_number = selected_server["number"]
-            logger.info(f"User selected server: {ip}:{port} (Number: {server_number}) in {country}")
-
-            # Fetch leaderboard data
-            try:
-                url = "https://slither-realtime-leaderboard.pages.dev/api/leaderboard"
-                response = requests.get(url, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Failed to fetch leaderboard data: {str(e)}")
-                await message.channel.send("Failed to fetch leaderboard data. API might be down.")
-                return
-
-            if "dataList" not in data:
-                logger.error("dataList not found in API response")
-                await message.channel.send("Failed to fetch leaderboard data. Unexpected API response.")
-                return
-
-            server_found = False
-            leaderboard_html = ""
-            for server in data["dataList"]:
-                if not (server.get("ipv4") == ip and str(server.get("po", "")) == port):
-                    continue
-
-                server_found = True
-                leaderboard = server.get("leaderboard", [])
-                # Show top 10 players
-                msg = f"**Top 10 Players - Server: {ip}:{port} (Number: {server_number}) ({country.capitalize()})**\n"
-                msg += "```\n"
-                msg += "🏆 Leaderboard 🏆\n"
-                msg += "------------------\n"
-                for p in leaderboard[:10]:  # Limit to top 10
-                    name = p.get("nk", "Unknown")
-                    score = p.get("len", 0)
-                    place = p.get("place", "?")
-                    msg += f"{place}. {name} - Score: {score}\n"
-                msg += "------------------\n"
-                msg += "```\n"
-                msg += "_Powered by Slither.io Bot_\n"
-
-                # Add map link
-                msg += "\n**View Server Map**: [Click Here](https://discord-bot-7ucy.onrender.com/)\n"
-                await asyncio.sleep(1)  # Avoid rate limiting
-                await message.channel.send(msg)
-
-                # Format for HTML (Leaderboard)
-                leaderboard_html = f"<h2>Server: {ip}:{port} (Number: {server_number}) ({country.capitalize()})</h2><ul>"
-                for p in leaderboard[:10]:  # Limit to top 10
-                    name = p.get("nk", "Unknown")
-                    score = p.get("len", 0)
-                    place = p.get("place", "?")
-                    leaderboard_html += f"<li>{place}. {name} - Score: {score}</li>"
-                leaderboard_html += "</ul>"
-
-                # Generate map for HTML
-                map_html = "<h2>Slither.io Server Map</h2><div class='map'>"
-                added_countries = set()
-                for country_name, servers in country_to_ip.items():
-                    if isinstance(servers, str):  # Skip aliases
-                        continue
-                    for server in servers:
-                        country_label = country_name.capitalize()
-                        if country_label in added_countries:
-                            continue
-                        added_countries.add(country_label)
-                        map_html += f"<div class='server-dot' style='left: {server['x']}; top: {server['y']};' title='{country_label} ({server['ip']}:{server['port']})'>{country_label}</div>"
-                map_html += "</div>"
-
-                html_content = f"""
-                <!DOCTYPE html>
-                <html lang="en">
-                <head>
-                    <meta charset="UTF-8">
-                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                    <title>Slither.io Leaderboard Bot</title>
-                    <link rel="stylesheet" href="/static/style.css">
-                </head>
-                <body>
-                    <div class="container">
-                        <h1>Slither.io Leaderboard Bot</h1>
-                        {map_html}
-                        <div id="leaderboard">
-                            {leaderboard_html if leaderboard_html else "<p>No leaderboard data available.</p>"}
-                        </div>
-                    </div>
-                    <script src="/static/script.js"></script>
-                </body>
-                </html>
-                """
-                # Save the latest HTML content to a global variable for Flask to serve
-                latest_html_content = html_content
-
-                # Save to /tmp for Render compatibility
-                try:
-                    with open("/tmp/bot.html", "w", encoding="utf-8") as f:
-                        f.write(html_content)
-                    logger.info("Successfully generated bot.html in /tmp")
-                except Exception as e:
-                    logger.error(f"Failed to write bot.html: {str(e)}")
-                    await message.channel.send("Failed to generate `bot.html`. Check bot logs for details.")
-                break
-
-            if not server_found:
-                logger.warning(f"Server {ip}:{port} not found in API response")
-                await message.channel.send(f"Server `{ip}:{port}` not found.")
-
-        except Exception as e:
-            logger.error(f"Unexpected error in #select: {str(e)}")
-            await message.channel.send(f"Error: {str(e)}")
+    # Show list of servers for the country
+    await outbox.send(message.channel, COUNTRY_MESSAGES[country])
+
+    # Store the user's selected country for the next command
+    user_selection.set(message.author.id, country)
+
+async def handle_select(message, args):
+    global latest_html_content
+    country = user_selection.get(message.author.id)
+    if country is None:
+        await outbox.send(message.channel, "Please run `#server <country>` first to select a country.")
+        return
+
+    selection = args.strip()
+
+    # Check if selection is a server number or an index
+    if not selection.isdigit():
+        await outbox.send(message.channel, "Please enter a valid number (e.g., `#select 1` or `#select 8828`).")
+        return
+
+    selected_server = registry.select(country, selection)
+    if selected_server is None:
+        await outbox.send(message.channel, f"Please select a number between 1 and {len(registry.servers(country))} or a valid server number.")
+        return
+
+    ip = selected_server.ip
+    port = selected_server.port
+    server_number = selected_server.number
+    logger.info(f"User selected server: {ip}:{port} (Number: {server_number}) in {country}")
+
+    # Fetch leaderboard data
+    try:
+        snapshot = await bot.leaderboard_cache.get()
+    except LeaderboardFormatError as e:
+        logger.error(f"Unexpected leaderboard response: {str(e)}")
+        await outbox.send(message.channel, "Failed to fetch leaderboard data. Unexpected API response.")
+        return
+    except LeaderboardError as e:
+        logger.error(f"Failed to fetch leaderboard data: {str(e)}")
+        await outbox.send(message.channel, "Failed to fetch leaderboard data. API might be down.")
+        return
+
+    cache_stats = bot.leaderboard_cache.stats()
+    logger.info(f"Leaderboard snapshot v{cache_stats['version']} age={cache_stats['age']}s "
+                f"(hits={cache_stats['hits']} stale={cache_stats['stale_hits']} misses={cache_stats['misses']})")
+
+    # O(1) lookup in the snapshot's (ipv4, port) index
+    board = snapshot.get(ip, port)
+    if board is None:
+        logger.warning(f"Server {ip}:{port} not found in API response")
+        await outbox.send(message.channel, f"Server `{ip}:{port}` not found.")
+        return
+
+    # Render (or reuse) the Discord reply and HTML page for this snapshot
+    rendered = renderer.leaderboard(selected_server, board, snapshot.version)
+    # Rate-limited per channel; identical replies for the same server and snapshot are merged
+    await outbox.send(message.channel, rendered.discord, key=(selected_server.key, snapshot.version))
+
+    # The per-server page is served from the render cache; `/` keeps showing the latest selection
+    latest_html_content = rendered.page
+    snapshot_store.save_page(rendered.page)
+
+def resolve_server_argument(message, selection):
+    # A global server number first, then an index or number in the user's selected country
+    server = registry.by_number(selection)
+    if server is None:
+        country = user_selection.get(message.author.id)
+        if country is not None:
+            server = registry.select(country, selection)
+    return server
+
+async def handle_watch(message, args):
+    selection = args.strip()
+    if not selection.isdigit():
+        await outbox.send(message.channel, "Please enter a server number (e.g., `#watch 8828`).")
+        return
+
+    server = resolve_server_argument(message, selection)
+    if server is None:
+        await outbox.send(message.channel, f"Server `{selection}` not found. Use `#server <country>` to see server numbers.")
+        return
+    logger.info(f"Watching server {server.ip}:{server.port} (Number: {server.number}) in channel {message.channel.id}")
+
+    try:
+        snapshot = await bot.leaderboard_cache.get()
+    except LeaderboardError as e:
+        logger.error(f"Failed to fetch leaderboard data: {str(e)}")
+        snapshot = bot.leaderboard_cache.snapshot  # The watch still starts; the poller fills it in
+
+    guild_id = message.guild.id if message.guild is not None else message.channel.id
+    try:
+        await watches.add(message.channel, guild_id, server, snapshot)
+    except WatchError as e:
+        await outbox.send(message.channel, str(e))
+
+async def handle_unwatch(message, args):
+    selection = args.strip()
+    server = None
+    if selection:
+        server = resolve_server_argument(message, selection) if selection.isdigit() else None
+        if server is None:
+            await outbox.send(message.channel, f"Server `{selection}` not found.")
             return
 
-    await bot.process_commands(message)
+    removed = await watches.remove(message.channel.id, server)
+    if not removed:
+        await outbox.send(message.channel, "This channel is not watching that server." if server else "This channel has no active watches.")
+        return
+    numbers = ", ".join(watch.server.number for watch in removed)
+    await outbox.send(message.channel, f"Stopped watching server {numbers}.")
+
+async def handle_history(message, args):
+    selection = args.strip()
+    if not selection.isdigit():
+        await outbox.send(message.channel, "Please enter a server number (e.g., `#history 8828`).")
+        return
+
+    server = resolve_server_argument(message, selection)
+    if server is None:
+        await outbox.send(message.channel, f"Server `{selection}` not found. Use `#server <country>` to see server numbers.")
+        return
+    logger.info(f"Received command: #history {server.number}")
+
+    buckets = history.downsample(server.key, window=HISTORY_COMMAND_WINDOW, buckets=HISTORY_COMMAND_BUCKETS)
+    lines = [f"**Score History - Server: {server.ip}:{server.port} (Number: {server.number}) ({server.country.capitalize()})**", "```"]
+    lines.append("Time (UTC)   Top score (min/avg/max)   Snakes (avg)")
+    for bucket in buckets:
+        label = time.strftime("%m-%d %H:%M", time.gmtime(bucket["t"]))
+        if not bucket["samples"]:
+            lines.append(f"{label}  -")
+            continue
+        top = bucket["top"]
+        lines.append(f"{label}  {top['min']:>7.0f} / {top['mean']:>7.0f} / {top['max']:>7.0f}   {bucket['snakes']['mean']:>6.0f}")
+    lines.append("```")
+    lines.append(f"Full data: {renderer.public_url}/history/{server.ip}/{server.port}")
+    await outbox.send(message.channel, "\n".join(lines))
+
+async def handle_find(message, args):
+    query = args.strip()
+    if not query:
+        await outbox.send(message.channel, "Please enter a nickname (e.g., `#find snake`).")
+        return
+
+    started = time.perf_counter()
+    mode, hits = nick_index.find(query, limit=FIND_LIMIT)
+    logger.info(f"Received command: #find {query} ({mode}, {len(hits)} hits in {(time.perf_counter() - started) * 1000:.3f} ms)")
+    if not hits:
+        if bot.leaderboard_cache.snapshot is None:
+            await outbox.send(message.channel, "No leaderboard data yet. Try again in a few seconds.")
+        else:
+            await outbox.send(message.channel, f"No player matching `{discord_safe(query)}` is on any leaderboard right now.")
+        return
+
+    title = "Players named" if mode == "exact" else "Players starting with" if mode == "prefix" else "Players similar to"
+    lines = [f"**{title} `{discord_safe(query)}`**", "```"]
+    for hit in hits:
+        server = registry.by_key(*hit.key)
+        where = f"{server.number} ({server.country.capitalize()})" if server else "unlisted server"
+        lines.append(f"{discord_safe(hit.nk)} - #{hit.place}, Score: {hit.len} - Server {where} {hit.key[0]}:{hit.key[1]}")
+    lines.append("```")
+    await outbox.send(message.channel, "\n".join(lines))
+
+async def handle_best(message, args):
+    content = args.strip().lower()
+    country = registry.resolve(content)
+    if country is None:
+        await outbox.send(message.channel, "Country not found. Use format `#best country` (e.g., `#best mumbai` or `#best eu`). Use `#server list` to see all countries.")
+        return
+    logger.info(f"Received command: #best {country}")
+
+    servers = registry.servers(country)
+    await bot.prober.ensure_fresh(servers)
+    ranked = bot.prober.rank(servers, bot.leaderboard_cache.snapshot)
+
+    lines = [f"**Best Servers in {country.capitalize()}** (TCP latency from the bot's host)", "```"]
+    for idx, (server, stats, snakes) in enumerate(ranked[:BEST_LIMIT], 1):
+        p50 = stats.percentile(0.5)
+        latency = f"{p50 * 1000:.0f} ms" if p50 is not None else "unreachable"
+        players = f"{snakes} snakes" if snakes is not None else "no data"
+        lines.append(f"{idx}. {server.ip}:{server.port} ({server.number}) - {latency}, {players}")
+    lines.append("```")
+    lines.append("Use `#server <country>` then `#select <number>` to see a server's leaderboard.")
+    await outbox.send(message.channel, "\n".join(lines))
+
+# Command word -> handler(message, args); anything else starting with "#" is ignored
+COMMANDS = {
+    "#server": handle_server,
+    "#select": handle_select,
+    "#watch": handle_watch,
+    "#unwatch": handle_unwatch,
+    "#history": handle_history,
+    "#find": handle_find,
+    "#best": handle_best,
+}
+
+@bot.event
+async def on_message(message):
+    content = message.content
+    # Plain chat is rejected with one character check, before any string work
+    if not content or content[0] != "#" or message.author.bot:
+        return
+
+    command, _, args = content.partition(" ")
+    command = command.lower()
+    handler = COMMANDS.get(command)
+    if handler is None:
+        return
+
+    # Only known command words become label values, so the metric has a fixed set of series
+    label = "#server list" if command == "#server" and args.strip().lower() == "list" else command
+    started = time.perf_counter()
+    # No prefixed bot commands are registered, so bot.process_commands is skipped entirely
+    try:
+        await handler(message, args)
+    except Exception as e:
+        metrics.COMMAND_ERRORS.inc(label)
+        logger.error(f"Unexpected error in {command}: {str(e)}")
+        await outbox.send(message.channel, f"Error: {str(e)}")
+    finally:
+        metrics.COMMAND_SECONDS.observe(time.perf_counter() - started, label)
+
+def stats_payload():
+    payload = {
+        "leaderboard_cache": bot.leaderboard_cache.stats(),
+        "render_cache": renderer.stats(),
+        "web": dict(web_stats.stats(), mode=WEB_MODE),
+        "live": live_hub.stats(),
+        "user_selection": user_selection.stats(),
+        "outbox": outbox.stats(),
+        "watches": watches.stats(),
+        "history": history.stats(),
+        "nick_index": nick_index.stats(),
+        "prober": bot.prober.stats(),
+        "persistence": snapshot_store.stats(),
+    }
+    if SNAPSHOT_SHM:
+        payload["shared_snapshot"] = dict(bot.leaderboard.stats(), pid=os.getpid(), shard_ids=SHARD_IDS)
+    return payload
+
+def register_metrics():
+    # Counters that already live on the caches are read at scrape time instead of being duplicated
+    cache = bot.leaderboard_cache
+    metrics.registry.callback("slitherbot_leaderboard_cache_hits_total", "Snapshot reads served fresh.", lambda: cache.hits, "counter")
+    metrics.registry.callback("slitherbot_leaderboard_cache_stale_hits_total", "Snapshot reads served stale while refreshing.", lambda: cache.stale_hits, "counter")
+    metrics.registry.callback("slitherbot_leaderboard_cache_misses_total", "Snapshot reads that waited for a fetch.", lambda: cache.misses, "counter")
+    metrics.registry.callback("slitherbot_leaderboard_refreshes_total", "Upstream refreshes started.", lambda: cache.refreshes, "counter")
+    metrics.registry.callback("slitherbot_leaderboard_errors_total", "Upstream refreshes that failed.", lambda: cache.errors, "counter")
+    metrics.registry.callback("slitherbot_leaderboard_age_seconds", "Age of the cached snapshot.", lambda: cache.age if cache.age is not None else float("nan"))
+    metrics.registry.callback("slitherbot_render_cache_hits_total", "Rendered pages reused.", lambda: renderer.hits, "counter")
+    metrics.registry.callback("slitherbot_render_cache_misses_total", "Pages rendered.", lambda: renderer.misses, "counter")
+    metrics.registry.callback("slitherbot_outbox_coalesced_total", "Replies shared instead of sent again.", lambda: outbox.coalesced, "counter")
+    metrics.registry.callback("slitherbot_persist_errors_total", "Snapshot or page writes that failed.", lambda: snapshot_store.errors, "counter")
+    metrics.registry.callback("slitherbot_live_viewers", "Connected live page viewers.", lambda: len(live_hub.viewers))
+    metrics.registry.callback("slitherbot_watches", "Active #watch messages.", lambda: len(watches))
+
+register_metrics()
 
 # Flask routes
+@app.before_request
+def start_timer():
+    g.started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    elapsed = time.perf_counter() - g.started
+    web_stats.record(response.status_code, elapsed)
+    metrics.HTTP_REQUEST_SECONDS.observe(elapsed, str(response.status_code))
+    return response
+
+def page_response(page):
+    status, headers, body = conditional_response(page, request.headers, max_age=int(LEADERBOARD_TTL))
+    return Response(body, status=status, headers=headers)
+
 @app.route('/')
 def serve_map():
-    global latest_html_content
     if latest_html_content:
-        return latest_html_content
-    return "<h1>No map data available</h1><p>Please use the bot to generate a map first.</p>"
+        return page_response(latest_html_content)
+    return NO_MAP_HTML
+
+@app.route('/server/<ip>/<port>')
+def serve_server(ip, port):
+    server = registry.by_key(ip, port)
+    if server is None:
+        abort(404)
+    return page_response(renderer.server_page(server, bot.leaderboard_cache.snapshot))
+
+@app.route('/country/<name>')
+def serve_country(name):
+    country = registry.resolve(name)
+    if country is None:
+        abort(404)
+    return page_response(renderer.country_page(country, bot.leaderboard_cache.snapshot))
+
+def history_payload(server, args):
+    try:
+        window = float(args.get("window", 86400))
+        if not math.isfinite(window):  # nan slips through min/max and inf is not a window
+            return None
+        window = min(max(window, 60), 30 * 86400)
+        buckets = min(max(int(args.get("buckets", 48)), 1), HISTORY_MAX_BUCKETS)
+    except ValueError:
+        return None
+    return {
+        "server": {"ip": server.ip, "port": server.port, "number": server.number, "country": server.country},
+        "window": window,
+        "buckets": history.downsample(server.key, window=window, buckets=buckets),
+    }
+
+@app.route('/history/<ip>/<port>')
+def serve_history(ip, port):
+    server = registry.by_key(ip, port)
+    if server is None:
+        abort(404)
+    payload = history_payload(server, request.args)
+    if payload is None:
+        abort(400)
+    return jsonify(payload)
+
+def find_payload(args):
+    query = args.get("q", "").strip()
+    if not query:
+        return None
+    mode, hits = nick_index.find(query, limit=FIND_LIMIT)
+    results = []
+    for hit in hits:
+        result = hit.to_dict()
+        server = registry.by_key(*hit.key)
+        if server is not None:
+            result.update(number=server.number, country=server.country, page=server_path(server))
+        results.append(result)
+    return {"query": query, "mode": mode, "results": results}
+
+@app.route('/find')
+def serve_find():
+    payload = find_payload(request.args)
+    if payload is None:
+        abort(400)
+    return jsonify(payload)
+
+LIVE_UNAVAILABLE = "The live view streams over Server-Sent Events and requires WEB_MODE=aiohttp."
+
+@app.route('/live')
+@app.route('/live/stream')
+def serve_live():
+    # The threaded Flask server has no event-loop hub to stream from
+    return Response(LIVE_UNAVAILABLE, status=501, mimetype="text/plain")
+
+@app.route('/stats')
+def serve_stats():
+    return jsonify(stats_payload())
+
+@app.route('/metrics')
+def serve_metrics():
+    return Response(metrics.registry.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+# aiohttp routes, served on the bot's event loop without thread hops
+routes = web.RouteTableDef()
+
+@web.middleware
+async def timing_middleware(request, handler):
+    if request.path == '/live/stream':
+        return await handler(request)  # Long-lived stream; its duration is not a request latency
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        web_stats.record(status, elapsed)
+        metrics.HTTP_REQUEST_SECONDS.observe(elapsed, str(status))
+
+def web_page_response(request, page):
+    status, headers, body = conditional_response(page, request.headers, max_age=int(LEADERBOARD_TTL))
+    return web.Response(body=body, status=status, headers=headers)
+
+@routes.get('/')
+async def web_serve_map(request):
+    if latest_html_content:
+        return web_page_response(request, latest_html_content)
+    return web.Response(text=NO_MAP_HTML, content_type="text/html")
+
+@routes.get('/server/{ip}/{port}')
+async def web_serve_server(request):
+    server = registry.by_key(request.match_info["ip"], request.match_info["port"])
+    if server is None:
+        raise web.HTTPNotFound()
+    return web_page_response(request, renderer.server_page(server, bot.leaderboard_cache.snapshot))
+
+@routes.get('/country/{name}')
+async def web_serve_country(request):
+    country = registry.resolve(request.match_info["name"])
+    if country is None:
+        raise web.HTTPNotFound()
+    return web_page_response(request, renderer.country_page(country, bot.leaderboard_cache.snapshot))
+
+@routes.get('/history/{ip}/{port}')
+async def web_serve_history(request):
+    server = registry.by_key(request.match_info["ip"], request.match_info["port"])
+    if server is None:
+        raise web.HTTPNotFound()
+    payload = history_payload(server, request.query)
+    if payload is None:
+        raise web.HTTPBadRequest()
+    return web.json_response(payload)
+
+@routes.get('/find')
+async def web_serve_find(request):
+    payload = find_payload(request.query)
+    if payload is None:
+        raise web.HTTPBadRequest()
+    return web.json_response(payload)
+
+@routes.get('/live')
+async def web_serve_live(request):
+    return web.FileResponse(LIVE_PAGE)
+
+@routes.get('/live/stream')
+async def web_live_stream(request):
+    response = web.StreamResponse(headers={
+        "Content-Type": "text/event-stream",
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+    await response.prepare(request)
+    await live_hub.stream(response)
+    return response
+
+@routes.get('/stats')
+async def web_serve_stats(request):
+    return web.json_response(stats_payload())
+
+@routes.get('/metrics')
+async def web_serve_metrics(request):
+    return web.Response(text=metrics.registry.render(), headers={"Content-Type": metrics.CONTENT_TYPE})
+
+def create_web_app():
+    web_app = web.Application(middlewares=[timing_middleware])
+    web_app.add_routes(routes)
+    web_app.router.add_static('/static', STATIC_DIR)
+    return web_app
+
+async def start_web(reuse_port=False):
+    runner = web.AppRunner(create_web_app(), access_log=None)
+    await runner.setup()
+    port = int(os.getenv("PORT", 5000))
+    # Cluster web processes share the port and the kernel spreads connections across them
+    await web.TCPSite(runner, host="0.0.0.0", port=port, reuse_port=reuse_port).start()
+    logger.info(f"Web frontend listening on port {port} (aiohttp)")
+    return runner
+
+async def run_bot_worker(token):
+    # Cluster bot process: its command and Discord metrics are only visible from here
+    runner = None
+    if METRICS_PORT:
+        metrics_app = web.Application()
+        metrics_app.router.add_get('/metrics', web_serve_metrics)
+        metrics_app.router.add_get('/stats', web_serve_stats)
+        runner = web.AppRunner(metrics_app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host="0.0.0.0", port=METRICS_PORT).start()
+        logger.info(f"Metrics listening on port {METRICS_PORT}")
+    try:
+        async with bot:
+            await bot.start(token)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+async def run_bot_with_web(token):
+    runner = await start_web()
+    try:
+        async with bot:
+            await bot.start(token)
+    finally:
+        await runner.cleanup()
 
 # Function to run Flask app in a separate thread
 def run_flask():
     port = int(os.getenv("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
 
-# Start Flask in a separate thread
-flask_thread = threading.Thread(target=run_flask)
-flask_thread.start()
-
-# Start Discord bot
-try:
-    token = os.getenv("DISCORD_TOKEN")
-    if not token:
-        raise ValueError("DISCORD_TOKEN not set. Please set it in environment variables on Render.")
-    bot.run(token)
-except Exception as e:
-    logger.error(f"Failed to start bot: {str(e)}")
\ No newline at end of file
+def warm_start():
+    # Serve the last persisted state while the first live fetch is in flight
+    global latest_html_content
+    snapshot, page_text = snapshot_store.load()
+    if snapshot is not None:
+        bot.leaderboard_cache.prime(snapshot)
+    if page_text:
+        latest_html_content = Page(page_text)
+
+async def follow_latest_page(interval=1.0):
+    # Cluster web processes pick up the #select pages that bot processes write to disk
+    global latest_html_content
+    seen = None
+    while True:
+        mtime = snapshot_store.page_mtime()
+        if mtime is not None and mtime != seen:
+            seen = mtime
+            page_text = snapshot_store.load_page()
+            if page_text:
+                latest_html_content = Page(page_text)
+        await asyncio.sleep(interval)
+
+async def run_web_worker():
+    # Cluster web process: serves pages from the shared snapshot, while the bot runs in other processes
+    await bot.leaderboard.start()
+    bot.start_background_tasks(probes=False)
+    page_task = asyncio.create_task(follow_latest_page())
+    runner = await start_web(reuse_port=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        page_task.cancel()
+        for task in bot.background_tasks:
+            task.cancel()
+        await runner.cleanup()
+        await bot.leaderboard.close()
+
+def main():
+    if DEPLOY_MODE == "cluster":
+        token = os.getenv("DISCORD_TOKEN")
+        if not token:
+            logger.error("Failed to start bot: DISCORD_TOKEN not set. Please set it in environment variables on Render.")
+            return
+        cluster.run_cluster(token)
+        return
+
+    warm_start()
+
+    if WEB_MODE == "flask":
+        # Start Flask in a separate thread
+        flask_thread = threading.Thread(target=run_flask)
+        flask_thread.start()
+
+    # Start Discord bot
+    try:
+        token = os.getenv("DISCORD_TOKEN")
+        if not token:
+            raise ValueError("DISCORD_TOKEN not set. Please set it in environment variables on Render.")
+        if WEB_MODE == "flask":
+            bot.run(token)
+        else:
+            try:
+                asyncio.run(run_bot_with_web(token))
+            except KeyboardInterrupt:
+                pass
+    except Exception as e:
+        logger.error(f"Failed to start bot: {str(e)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Microbenchmark for on_message dispatch on a chat-heavy message mix.
+
+Drives app.on_message directly with lightweight stand-ins for discord.py
+messages; no Discord token or network access is needed.
+
+    python bench/bench_dispatch.py --messages 200000 --command-ratio 0.02
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Measure dispatch cost, not the outbound rate limiter's deliberate waits
+for name in ("OUTBOX_CHANNEL_RATE", "OUTBOX_CHANNEL_BURST", "OUTBOX_GLOBAL_RATE", "OUTBOX_GLOBAL_BURST"):
+    os.environ.setdefault(name, "1000000")
+
+import app  # noqa: E402
+from fakes import FakeAuthor, FakeChannel, FakeMessage  # noqa: E402
+
+CHAT_LINES = [
+    "lol", "gg", "anyone on mumbai rn?", "that snake was huge", "brb",
+    "#1 on the board again", "what server are you on", "https://slither.io",
+    "nice", "ok", "who is xXSnakeXx", "let's go frankfurt", "#", "#general chat",
+]
+COMMAND_LINES = ["#server list", "#server mumbai", "#server ind", "#server nowhere", "#help"]
+
+
+def build_messages(count, command_ratio, seed):
+    rng = random.Random(seed)
+    channel = FakeChannel()
+    authors = [FakeAuthor(user_id) for user_id in range(500)]
+    messages = []
+    for _ in range(count):
+        lines = COMMAND_LINES if rng.random() < command_ratio else CHAT_LINES
+        messages.append(FakeMessage(rng.choice(lines), rng.choice(authors), channel))
+    return messages, channel
+
+
+async def run(messages):
+    on_message = app.on_message
+    started = time.perf_counter()
+    for message in messages:
+        await on_message(message)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--command-ratio", type=float, default=0.02, help="share of messages that are # commands")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger("SlitherBot").setLevel(logging.WARNING)  # Keep per-command logging out of the timing
+
+    for label, ratio in (("chat only", 0.0), (f"chat + {args.command_ratio:.0%} commands", args.command_ratio)):
+        messages, channel = build_messages(args.messages, ratio, args.seed)
+        elapsed = asyncio.run(run(messages))
+        print(f"{label:>24}: {len(messages) / elapsed:12,.0f} messages/s "
+              f"({elapsed / len(messages) * 1e6:.2f} us/message, {channel.sent} replies)")
+
+
+if __name__ == "__main__":
+    main()
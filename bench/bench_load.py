@@ -0,0 +1,285 @@
+"""End-to-end load benchmark that runs fully offline.
+
+Starts bench/fake_upstream.py in place of the leaderboard API, drives
+app.on_message with fake Discord messages and points bench/loadgen.py at
+the aiohttp frontend. For each scenario it reports throughput, p50/p99
+latency, memory and the number of upstream requests, and saves all of it
+as JSON so runs can be compared.
+
+    python bench/bench_load.py --servers 2000 --churn 0.1
+    python bench/bench_load.py --compare bench/results/<earlier run>.json
+
+Scenarios:
+    burst_select   many users run #server then #select at the same moment, in rounds
+    chat_noise     a chat-heavy message stream with a small share of commands
+    page_viewers   concurrent page viewers (with ETag revalidation) plus /live/stream clients
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import aiohttp  # noqa: E402
+
+from fakes import FakeAuthor, FakeChannel, FakeGuild, FakeMessage  # noqa: E402
+from loadgen import latency_summary  # noqa: E402
+
+SCENARIOS = ("burst_select", "chat_noise", "page_viewers")
+CHAT_LINES = ["lol", "gg", "anyone on mumbai rn?", "brb", "#1 again", "nice", "#general chat", "https://slither.io"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def configure_environment(args, upstream_port, web_port):
+    # Must run before app is imported; these are read at import time
+    os.environ["LEADERBOARD_URL"] = f"http://127.0.0.1:{upstream_port}/api/leaderboard"
+    os.environ["PORT"] = str(web_port)
+    os.environ["SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="slitherbot-bench-")
+    if not args.real_rate_limits:
+        # Measure the bot's own cost instead of the outbound rate limiter's deliberate waits
+        for name in ("OUTBOX_CHANNEL_RATE", "OUTBOX_CHANNEL_BURST", "OUTBOX_GLOBAL_RATE", "OUTBOX_GLOBAL_BURST"):
+            os.environ[name] = "1000000"
+
+
+class Upstream:
+    """fake_upstream.py in a child process, so it does not compete for the bot's event loop."""
+
+    def __init__(self, args, port, endpoints):
+        self.port = port
+        self.endpoints_file = os.path.join(os.environ["SNAPSHOT_DIR"], "endpoints.json")
+        with open(self.endpoints_file, "w") as f:
+            json.dump(endpoints, f)
+        self.command = [
+            sys.executable, os.path.join(BENCH_DIR, "fake_upstream.py"), "--port", str(port),
+            "--servers", str(args.servers), "--churn", str(args.churn), "--latency", str(args.upstream_latency),
+            "--endpoints", self.endpoints_file, "--seed", str(args.seed),
+        ]
+        self.process = None
+
+    async def start(self, session):
+        self.process = subprocess.Popen(self.command)
+        for _ in range(200):
+            try:
+                return await self.stats(session)
+            except aiohttp.ClientError:
+                await asyncio.sleep(0.05)
+        raise RuntimeError("fake upstream did not start")
+
+    async def stats(self, session):
+        async with session.get(f"http://127.0.0.1:{self.port}/_stats") as response:
+            return await response.json()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+
+
+async def scenario_burst_select(app, args, rng):
+    countries = list(app.registry.countries)
+    guild = FakeGuild(1)
+    latencies = []
+
+    async def user(user_id):
+        channel = FakeChannel(user_id % args.channels, args.send_latency)
+        author = FakeAuthor(user_id)
+        country = rng.choice(countries)
+        index = rng.randint(1, len(app.registry.servers(country)))
+        for content in (f"#server {country}", f"#select {index}"):
+            started = time.perf_counter()
+            await app.on_message(FakeMessage(content, author, channel, guild))
+            latencies.append(time.perf_counter() - started)
+
+    busy = 0.0  # Time inside bursts; the gaps between rounds do not count against throughput
+    for round_number in range(args.rounds):
+        started = time.perf_counter()
+        await asyncio.gather(*(user(user_id) for user_id in range(args.users)))
+        busy += time.perf_counter() - started
+        if round_number < args.rounds - 1:
+            await asyncio.sleep(args.round_gap)
+    return latency_summary(latencies, busy)
+
+
+async def scenario_chat_noise(app, args, rng):
+    countries = list(app.registry.countries)
+    commands = ["#server list", *(f"#server {country}" for country in countries), "#select 1", "#find snake"]
+    channels = [FakeChannel(channel_id, args.send_latency) for channel_id in range(args.channels)]
+    authors = [FakeAuthor(user_id) for user_id in range(args.users)]
+    guild = FakeGuild(1)
+    messages = []
+    for _ in range(args.messages):
+        is_command = rng.random() < args.command_ratio
+        content = rng.choice(commands if is_command else CHAT_LINES)
+        messages.append((FakeMessage(content, rng.choice(authors), rng.choice(channels), guild), is_command))
+    latencies = []
+    command_latencies = []
+    started = time.perf_counter()
+    for message, is_command in messages:
+        message_started = time.perf_counter()
+        await app.on_message(message)
+        elapsed = time.perf_counter() - message_started
+        latencies.append(elapsed)
+        if is_command:
+            command_latencies.append(elapsed)
+    wall = time.perf_counter() - started
+    return dict(latency_summary(latencies, wall), commands=latency_summary(command_latencies, wall))
+
+
+async def scenario_page_viewers(app, args, rng):
+    servers = list(app.registry.all_servers())
+    paths = ["/", "/live", "/find?q=snake"]
+    paths.extend(f"/server/{server.ip}/{server.port}" for server in rng.sample(servers, min(20, len(servers))))
+    paths.extend(f"/country/{country}" for country in list(app.registry.countries)[:5])
+
+    # Give `/` a selected map to serve, as after a real #select
+    channel = FakeChannel(0)
+    await app.on_message(FakeMessage("#server mumbai", FakeAuthor(0), channel, FakeGuild(1)))
+    await app.on_message(FakeMessage("#select 1", FakeAuthor(0), channel, FakeGuild(1)))
+
+    # The shared poller feeds SSE viewers as it does in production
+    poller = asyncio.create_task(app.poll_leaderboard(app.bot.leaderboard_cache, args.poll_interval))
+    runner = await app.start_web()
+    try:
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, os.path.join(BENCH_DIR, "loadgen.py"), f"http://127.0.0.1:{os.environ['PORT']}",
+            "--paths", *paths, "--concurrency", str(args.viewers), "--duration", str(args.duration),
+            "--sse", str(args.sse), "--seed", str(args.seed), stdout=asyncio.subprocess.PIPE,
+        )
+        stdout, _ = await process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"loadgen exited with {process.returncode}")
+        return json.loads(stdout)
+    finally:
+        poller.cancel()
+        await runner.cleanup()
+
+
+async def run(args):
+    upstream_port = free_port()
+    configure_environment(args, upstream_port, free_port())
+    import app  # Imported late so it picks up the environment above
+
+    endpoints = [[server.ip, server.port] for server in app.registry.all_servers()]
+    upstream = Upstream(args, upstream_port, endpoints)
+    rng = random.Random(args.seed)
+    results = {}
+    async with aiohttp.ClientSession() as session:
+        upstream_info = await upstream.start(session)
+        await app.bot.leaderboard.start()
+        try:
+            for name in args.scenarios:
+                before = await upstream.stats(session)
+                rss_before = rss_bytes()
+                result = await globals()[f"scenario_{name}"](app, args, rng)
+                after = await upstream.stats(session)
+                result.update(
+                    upstream_requests=after["requests"] - before["requests"],
+                    upstream_bytes=after["bytes"] - before["bytes"],
+                    rss_before=rss_before,
+                    rss_after=rss_bytes(),
+                    peak_rss=peak_rss_bytes(),
+                )
+                results[name] = result
+                print(f"{name:>13}: {result['per_second']:>10,.1f}/s  p50 {result['p50_ms']} ms  p99 {result['p99_ms']} ms  "
+                      f"upstream {result['upstream_requests']} requests  rss {(result['rss_after'] or 0) / 2**20:.1f} MiB",
+                      flush=True)
+        finally:
+            await app.bot.leaderboard.close()
+            upstream.stop()
+    return {"upstream": upstream_info, "scenarios": results}
+
+
+def compare(current, baseline, tolerance):
+    """Print per-scenario changes against a baseline run; returns True when something regressed."""
+    regressed = False
+    for name, result in current["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        for key, higher_is_better in (("per_second", True), ("p50_ms", False), ("p99_ms", False)):
+            old, new = base.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            regressed = regressed or bool(flag)
+            print(f"{name:>13} {key:>10}: {old:>12,.3f} -> {new:>12,.3f} ({change:+.1%}){flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--servers", type=int, default=1000, help="servers in each upstream payload")
+    parser.add_argument("--churn", type=float, default=0.1, help="share of servers changed per upstream request")
+    parser.add_argument("--upstream-latency", type=float, default=0.05, help="seconds the fake API takes to answer")
+    parser.add_argument("--send-latency", type=float, default=0.0, help="seconds each fake Discord send takes")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5, help="burst_select rounds")
+    parser.add_argument("--round-gap", type=float, default=1.0, help="seconds between burst_select rounds")
+    parser.add_argument("--messages", type=int, default=100000, help="chat_noise messages")
+    parser.add_argument("--command-ratio", type=float, default=0.02)
+    parser.add_argument("--viewers", type=int, default=100, help="page_viewers concurrent viewers")
+    parser.add_argument("--sse", type=int, default=50, help="page_viewers /live/stream connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="page_viewers seconds")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="upstream poll period during page_viewers")
+    parser.add_argument("--real-rate-limits", action="store_true", help="keep the outbound Discord rate limits")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="result file (default bench/results/load-<time>.json)")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change reported as a regression")
+    args = parser.parse_args()
+
+    logging.getLogger("SlitherBot").setLevel(logging.WARNING)  # Keep per-command logging out of the timing
+
+    result = asyncio.run(run(args))
+    result.update(
+        started_at=time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        python=sys.version.split()[0],
+        config={key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+    )
+
+    output = args.output or os.path.join(BENCH_DIR, "results", time.strftime("load-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Saved {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(result, json.load(f), args.tolerance):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Stand-in for the realtime leaderboard API, for offline benchmarks.
+
+Serves a `dataList` payload of configurable size on /api/leaderboard. Every
+request moves a share of the servers' leaderboards (--churn), so snapshot
+diffs, history and the nick index see realistic change. /_stats reports
+how many requests and bytes were served.
+
+    python bench/fake_upstream.py --port 8787 --servers 2000 --churn 0.1
+    LEADERBOARD_URL=http://127.0.0.1:8787/api/leaderboard python app.py
+"""
+import argparse
+import asyncio
+import json
+import random
+
+from aiohttp import web
+
+NICK_PARTS = ["snake", "slither", "xX", "Xx", "pro", "noob", "king", "worm", "boa", "viper", "mamba", "ツ", "ñ", "_", "69", "420"]
+
+
+class FakeLeaderboard:
+    def __init__(self, servers=1000, entries=10, churn=0.1, endpoints=(), latency=0.0, seed=1):
+        self.entries = entries
+        self.churn = churn
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.bytes_sent = 0
+
+        # Known endpoints first, so bot commands for real servers find data, then synthetic ones
+        keys = [(ip, str(port)) for ip, port in endpoints]
+        for n in range(max(0, servers - len(keys))):
+            keys.append((f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}", "444"))
+        self.servers = [self._new_server(ip, port) for ip, port in keys]
+        self._fragments = [self._encode(server) for server in self.servers]
+
+    def _nick(self):
+        return "".join(self.rng.choice(NICK_PARTS) for _ in range(self.rng.randint(1, 3)))
+
+    def _new_server(self, ip, port):
+        lengths = sorted((self.rng.randint(10, 50000) for _ in range(self.entries)), reverse=True)
+        return {
+            "ipv4": ip,
+            "po": int(port),
+            "snakeCount": self.rng.randint(0, 600),
+            "leaderboard": [{"nk": self._nick(), "len": length, "place": place + 1} for place, length in enumerate(lengths)],
+        }
+
+    @staticmethod
+    def _encode(server):
+        return json.dumps(server, ensure_ascii=False, separators=(",", ":"))
+
+    def step(self):
+        """Change roughly churn * servers leaderboards; only those are re-encoded."""
+        count = int(len(self.servers) * self.churn)
+        for i in self.rng.sample(range(len(self.servers)), count):
+            server = self.servers[i]
+            board = server["leaderboard"]
+            for entry in board:
+                entry["len"] += self.rng.randint(0, 500)
+            if board and self.rng.random() < 0.3:
+                board[self.rng.randrange(len(board))]["nk"] = self._nick()
+            board.sort(key=lambda entry: -entry["len"])
+            for place, entry in enumerate(board):
+                entry["place"] = place + 1
+            server["snakeCount"] = max(0, server["snakeCount"] + self.rng.randint(-20, 20))
+            self._fragments[i] = self._encode(server)
+
+    def payload(self):
+        return ('{"dataList":[' + ",".join(self._fragments) + "]}").encode("utf-8")
+
+    async def handle_leaderboard(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.step()
+        body = self.payload()
+        self.requests += 1
+        self.bytes_sent += len(body)
+        return web.Response(body=body, content_type="application/json")
+
+    async def handle_stats(self, request):
+        return web.json_response({"requests": self.requests, "bytes": self.bytes_sent, "servers": len(self.servers)})
+
+    def create_app(self):
+        fake_app = web.Application()
+        fake_app.router.add_get("/api/leaderboard", self.handle_leaderboard)
+        fake_app.router.add_get("/_stats", self.handle_stats)
+        return fake_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--servers", type=int, default=1000, help="servers in each payload")
+    parser.add_argument("--entries", type=int, default=10, help="leaderboard entries per server")
+    parser.add_argument("--churn", type=float, default=0.1, help="share of servers changed per request")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--endpoints", help="JSON file of [ip, port] pairs to include")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    endpoints = ()
+    if args.endpoints:
+        with open(args.endpoints) as f:
+            endpoints = json.load(f)
+    fake = FakeLeaderboard(args.servers, args.entries, args.churn, endpoints, args.latency, args.seed)
+    print(f"Fake leaderboard: {len(fake.servers)} servers, {len(fake.payload()):,} byte payload", flush=True)
+    web.run_app(fake.create_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
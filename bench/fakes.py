@@ -0,0 +1,65 @@
+"""Lightweight stand-ins for the discord.py objects that app.on_message touches."""
+import asyncio
+
+
+class FakeAuthor:
+    __slots__ = ("id", "bot")
+
+    def __init__(self, user_id):
+        self.id = user_id
+        self.bot = False
+
+
+class FakeGuild:
+    __slots__ = ("id",)
+
+    def __init__(self, guild_id):
+        self.id = guild_id
+
+
+class FakeSentMessage:
+    """What channel.send returns; supports the edit/pin calls #watch makes."""
+
+    __slots__ = ("channel", "content")
+
+    def __init__(self, channel, content):
+        self.channel = channel
+        self.content = content
+
+    async def edit(self, content=None, **kwargs):
+        if self.channel.latency:
+            await asyncio.sleep(self.channel.latency)
+        self.content = content
+
+    async def pin(self):
+        pass
+
+    async def unpin(self):
+        pass
+
+
+class FakeChannel:
+    """Counts replies; latency simulates the Discord API round trip of each send."""
+
+    __slots__ = ("id", "sent", "latency")
+
+    def __init__(self, channel_id=1, latency=0.0):
+        self.id = channel_id
+        self.sent = 0
+        self.latency = latency
+
+    async def send(self, content=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.sent += 1
+        return FakeSentMessage(self, content)
+
+
+class FakeMessage:
+    __slots__ = ("content", "author", "channel", "guild")
+
+    def __init__(self, content, author, channel, guild=None):
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = guild
@@ -0,0 +1,127 @@
+"""HTTP load generator for the web frontend.
+
+Simulated viewers fetch a mix of pages as fast as the server answers. A
+share of them revalidate with If-None-Match like a browser would, and
+optional /live/stream viewers hold Server-Sent Events connections open.
+Works against any running instance, local or deployed.
+
+    python bench/loadgen.py http://127.0.0.1:5000 --paths / /country/mumbai --concurrency 100 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import aiohttp
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def latency_summary(latencies, elapsed):
+    p50 = percentile(latencies, 0.5)
+    p99 = percentile(latencies, 0.99)
+    return {
+        "count": len(latencies),
+        "per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+        "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else None,
+    }
+
+
+async def _viewer(session, base_url, paths, deadline, revalidate, rng, latencies, statuses, counters):
+    etags = {}
+    while time.perf_counter() < deadline:
+        path = rng.choice(paths)
+        headers = {"Accept-Encoding": "gzip, br"}
+        if revalidate and path in etags:
+            headers["If-None-Match"] = etags[path]
+        started = time.perf_counter()
+        try:
+            async with session.get(base_url + path, headers=headers) as response:
+                body = await response.read()
+                status = response.status
+                etag = response.headers.get("ETag")
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            counters["errors"] += 1
+            continue
+        latencies.append(time.perf_counter() - started)
+        statuses[status] = statuses.get(status, 0) + 1
+        counters["bytes"] += len(body)
+        if etag:
+            etags[path] = etag
+
+
+async def _stream_viewer(session, base_url, deadline, counters):
+    try:
+        async with session.get(base_url + "/live/stream", timeout=aiohttp.ClientTimeout(total=None)) as response:
+            counters["sse_connected"] += 1
+            tail = b""
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    chunk = await asyncio.wait_for(response.content.readany(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if not chunk:
+                    break
+                # Events end with a blank line; a snapshot event can be far larger than one chunk
+                counters["sse_events"] += (tail + chunk).count(b"\n\n")
+                counters["sse_bytes"] += len(chunk)
+                tail = chunk[-1:]
+    except aiohttp.ClientError:
+        counters["errors"] += 1
+
+
+async def run_load(base_url, paths, concurrency=50, duration=10.0, revalidate=0.5, sse=0, seed=1):
+    """Run the load for duration seconds and return a summary dict."""
+    base_url = base_url.rstrip("/")
+    rng = random.Random(seed)
+    latencies = []
+    statuses = {}
+    counters = {"bytes": 0, "errors": 0, "sse_connected": 0, "sse_events": 0, "sse_bytes": 0}
+    connector = aiohttp.TCPConnector(limit=concurrency + sse)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=30)) as session:
+        started = time.perf_counter()
+        deadline = started + duration
+        tasks = [
+            _viewer(session, base_url, paths, deadline, rng.random() < revalidate,
+                    random.Random(rng.random()), latencies, statuses, counters)
+            for _ in range(concurrency)
+        ]
+        tasks.extend(_stream_viewer(session, base_url, deadline, counters) for _ in range(sse))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+    return dict(
+        latency_summary(latencies, elapsed),
+        statuses={str(status): count for status, count in sorted(statuses.items())},
+        **counters,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base_url")
+    parser.add_argument("--paths", nargs="+", default=["/"])
+    parser.add_argument("--concurrency", type=int, default=50, help="simulated page viewers")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--revalidate", type=float, default=0.5, help="share of viewers sending If-None-Match")
+    parser.add_argument("--sse", type=int, default=0, help="/live/stream connections held open")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    result = asyncio.run(run_load(args.base_url, args.paths, args.concurrency, args.duration,
+                                  args.revalidate, args.sse, args.seed))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
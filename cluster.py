@@ -0,0 +1,217 @@
+"""Multi-process deployment: sharded bot processes, web processes and one upstream fetcher.
+
+Started by `DEPLOY_MODE=cluster python app.py`. The supervisor creates the
+shared snapshot segment and starts:
+
+- one fetcher process, the only one that polls the leaderboard API. It
+  publishes every snapshot to shared memory and persists it to disk.
+- CLUSTER_BOT_PROCESSES bot processes, each an AutoShardedBot running its
+  share of the gateway shards. bot-0 also runs the background latency sweep.
+- CLUSTER_WEB_PROCESSES aiohttp processes that share PORT through
+  SO_REUSEPORT.
+
+Workers that exit are restarted.
+
+Metrics are per process. /metrics and /stats on PORT answer from whichever
+web process the kernel picks, so they only cover the web frontend and the
+shared snapshot. Command, Discord request and rate-limit metrics live in the
+bot processes; set CLUSTER_METRICS_PORT to have bot-k serve /metrics and
+/stats on that port + k, and scrape each one. Without it those metrics are
+not exposed in cluster mode.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import time
+from multiprocessing.connection import wait
+
+import aiohttp
+
+from leaderboard import LEADERBOARD_POLL_INTERVAL, LEADERBOARD_TTL, LeaderboardCache, LeaderboardClient, poll_leaderboard
+from outbound import GLOBAL_BURST, GLOBAL_RATE
+from persist import SnapshotStore
+from shared import SharedSnapshot
+
+logger = logging.getLogger('SlitherBot')
+
+CLUSTER_BOT_PROCESSES = int(os.getenv("CLUSTER_BOT_PROCESSES", "2"))
+CLUSTER_WEB_PROCESSES = int(os.getenv("CLUSTER_WEB_PROCESSES", "2"))
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0"))  # Total gateway shards, 0 asks Discord for its recommendation
+CLUSTER_BOT_STAGGER = float(os.getenv("CLUSTER_BOT_STAGGER", "5"))  # Seconds between bot process starts, for the identify limit
+CLUSTER_RESTART_DELAY = float(os.getenv("CLUSTER_RESTART_DELAY", "5"))  # Seconds before a crashed worker is restarted
+CLUSTER_FIRST_PUBLISH_WAIT = float(os.getenv("CLUSTER_FIRST_PUBLISH_WAIT", "15"))  # Seconds to wait for the first snapshot
+CLUSTER_METRICS_PORT = int(os.getenv("CLUSTER_METRICS_PORT", "0"))  # bot-k serves /metrics and /stats on this port + k, 0 disables
+CLUSTER_STOP_TIMEOUT = 10  # Seconds a worker gets to shut down before it is killed
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+DISCORD_GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+
+
+async def recommended_shards(token):
+    async with aiohttp.ClientSession(headers={"Authorization": f"Bot {token}"}) as session:
+        async with session.get(DISCORD_GATEWAY_URL) as response:
+            response.raise_for_status()
+            return (await response.json())["shards"]
+
+
+def shard_assignment(shard_count, processes):
+    """Spread shard ids round-robin over the bot processes."""
+    return [list(range(k, shard_count, processes)) for k in range(processes)]
+
+
+async def run_fetcher(shared, interval=LEADERBOARD_POLL_INTERVAL or LEADERBOARD_TTL):
+    client = LeaderboardClient()
+    cache = LeaderboardCache(client)
+    store = SnapshotStore()
+    cache.add_listener(lambda old, new: shared.publish(new))
+    cache.add_listener(lambda old, new: store.save_snapshot(new))
+
+    # Workers get the last persisted snapshot right away; versions continue from it
+    snapshot, _ = store.load()
+    if snapshot is not None:
+        cache.prime(snapshot)
+        shared.publish(snapshot)
+
+    await client.start()
+    try:
+        await poll_leaderboard(cache, interval)
+    finally:
+        await client.close()
+
+
+def _fetcher_main(shm_name):
+    try:
+        asyncio.run(run_fetcher(SharedSnapshot.attach(shm_name)))
+    except KeyboardInterrupt:
+        pass
+
+
+def _app_module():
+    # A spawned child first re-runs the parent's main script as __mp_main__. When that is app.py
+    # the bot is already built from this worker's environment; importing app would build a second one
+    main = sys.modules.get("__mp_main__")
+    if os.path.abspath(getattr(main, "__file__", None) or "") == APP_PATH:
+        return main
+    import app
+    return app
+
+
+def _bot_main():
+    app = _app_module()
+    try:
+        asyncio.run(app.run_bot_worker(os.environ["DISCORD_TOKEN"]))
+    except KeyboardInterrupt:
+        pass
+
+
+def _web_main():
+    app = _app_module()
+    try:
+        asyncio.run(app.run_web_worker())
+    except KeyboardInterrupt:
+        pass
+
+
+def _run_child(target, args):
+    # force: app.py may already have configured logging while the child re-ran it as __mp_main__
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(processName)s:%(name)s:%(message)s", force=True)
+    target(*args)
+
+
+class Worker:
+    def __init__(self, name, target, env, args=(), start_at=0.0):
+        self.name = name
+        self.target = target
+        self.env = env
+        self.args = args
+        self.start_at = start_at
+        self.process = None
+        self.restarts = 0
+
+    def start(self, context):
+        # The child inherits the environment at spawn, before it re-runs the main module that reads it
+        saved = {key: os.environ.get(key) for key in self.env}
+        os.environ.update(self.env)
+        try:
+            self.process = context.Process(target=_run_child, args=(self.target, self.args), name=self.name)
+            self.process.start()
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+        logger.info(f"Started {self.name} (pid {self.process.pid})")
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            os.kill(self.process.pid, signal.SIGINT)  # Lets discord.py and aiohttp close cleanly
+
+
+def run_cluster(token):
+    shard_count = SHARD_COUNT or asyncio.run(recommended_shards(token))
+    shard_count = max(shard_count, CLUSTER_BOT_PROCESSES)  # Every bot process gets at least one shard
+    shared = SharedSnapshot.create()
+    context = multiprocessing.get_context("spawn")
+    shm_env = {"SNAPSHOT_SHM": shared.name}
+
+    workers = [Worker("fetcher", _fetcher_main, shm_env, args=(shared.name,))]
+    now = time.monotonic()
+    for k, shard_ids in enumerate(shard_assignment(shard_count, CLUSTER_BOT_PROCESSES)):
+        env = dict(
+            shm_env,
+            SHARD_IDS=",".join(map(str, shard_ids)),
+            SHARD_COUNT=str(shard_count),
+            # Discord's global rate limit is per bot token, so the processes split it
+            OUTBOX_GLOBAL_RATE=str(GLOBAL_RATE / CLUSTER_BOT_PROCESSES),
+            OUTBOX_GLOBAL_BURST=str(max(1, GLOBAL_BURST // CLUSTER_BOT_PROCESSES)),
+            METRICS_PORT=str(CLUSTER_METRICS_PORT + k if CLUSTER_METRICS_PORT else 0),
+        )
+        if k > 0:
+            # Only bot-0 sweeps every game endpoint; the others still probe a country's servers on demand
+            env["PROBE_INTERVAL"] = "0"
+        workers.append(Worker(f"bot-{k}", _bot_main, env, start_at=now + k * CLUSTER_BOT_STAGGER))
+    workers.extend(Worker(f"web-{k}", _web_main, shm_env) for k in range(CLUSTER_WEB_PROCESSES))
+    logger.info(f"Cluster: {shard_count} shards over {CLUSTER_BOT_PROCESSES} bot processes, {CLUSTER_WEB_PROCESSES} web processes")
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, request_stop)
+    try:
+        workers[0].start(context)
+        deadline = time.monotonic() + CLUSTER_FIRST_PUBLISH_WAIT
+        while shared.sequence() == 0 and time.monotonic() < deadline:
+            time.sleep(0.1)  # Let workers start with a snapshot in place
+
+        while not stopping:
+            now = time.monotonic()
+            for worker in workers:
+                if worker.process is None and now >= worker.start_at:
+                    worker.start(context)
+                elif worker.process is not None and not worker.process.is_alive():
+                    logger.error(f"{worker.name} exited with code {worker.process.exitcode}; restarting in {CLUSTER_RESTART_DELAY:.0f}s")
+                    worker.process = None
+                    worker.restarts += 1
+                    worker.start_at = now + CLUSTER_RESTART_DELAY
+            sentinels = [worker.process.sentinel for worker in workers if worker.process is not None]
+            wait(sentinels, timeout=1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info("Stopping cluster")
+        for worker in workers:
+            worker.stop()
+        for worker in workers:
+            if worker.process is not None:
+                worker.process.join(CLUSTER_STOP_TIMEOUT)
+                if worker.process.is_alive():
+                    worker.process.kill()
+        shared.close()
@@ -0,0 +1,175 @@
+import os
+import time
+from array import array
+
+try:
+    import numpy
+except ImportError:  # numpy is in requirements.txt; plain Python covers installs without it
+    numpy = None
+
+HISTORY_CAPACITY = int(os.getenv("HISTORY_CAPACITY", "2880"))  # Samples kept per server (2 days at 60 s)
+HISTORY_SAMPLE_INTERVAL = float(os.getenv("HISTORY_SAMPLE_INTERVAL", "60"))  # Minimum seconds between samples
+HISTORY_TOP_N = int(os.getenv("HISTORY_TOP_N", "5"))  # Leaderboard lengths kept per sample
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+class ServerHistory:
+    """Fixed-size ring buffer of samples for one server, stored as typed array columns."""
+
+    __slots__ = ("capacity", "top_n", "times", "top", "snakes", "lengths", "filled", "head", "count")
+
+    def __init__(self, capacity, top_n):
+        self.capacity = capacity
+        self.top_n = top_n
+        self.times = array("d", bytes(8 * capacity))
+        self.top = array("i", bytes(4 * capacity))
+        self.snakes = array("i", bytes(4 * capacity))
+        self.lengths = array("i", bytes(4 * capacity * top_n))  # Row-major, top_n per sample, zero-padded
+        self.filled = array("i", bytes(4 * capacity))  # Real entries in each lengths row
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def append(self, timestamp, board):
+        i = self.head
+        lengths = [_as_int(entry.len) for entry in board.entries[:self.top_n]]
+        self.times[i] = timestamp
+        self.top[i] = lengths[0] if lengths else 0
+        self.snakes[i] = _as_int(board.snake_count)
+        self.filled[i] = len(lengths)
+        row = i * self.top_n
+        lengths.extend([0] * (self.top_n - len(lengths)))
+        self.lengths[row:row + self.top_n] = array("i", lengths)
+        self.head = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """Return (times, top, snakes, lengths, filled) oldest first; the arrays are copies."""
+        if self.count < self.capacity:
+            end = self.count
+            return (self.times[:end], self.top[:end], self.snakes[:end], self.lengths[:end * self.top_n], self.filled[:end])
+        h = self.head
+        n = self.top_n
+        return (
+            self.times[h:] + self.times[:h],
+            self.top[h:] + self.top[:h],
+            self.snakes[h:] + self.snakes[:h],
+            self.lengths[h * n:] + self.lengths[:h * n],
+            self.filled[h:] + self.filled[:h],
+        )
+
+
+def _empty_bucket(start):
+    return {"t": start, "samples": 0}
+
+
+def _downsample_numpy(times, top, snakes, lengths, filled, top_n, start, width, buckets):
+    t = numpy.frombuffer(times, dtype=numpy.float64)
+    first = int(numpy.searchsorted(t, start))
+    t = t[first:]
+    columns = {
+        "top": numpy.frombuffer(top, dtype=numpy.int32)[first:],
+        "snakes": numpy.frombuffer(snakes, dtype=numpy.int32)[first:],
+        # Padding is zero, so the row sum over the real entry count is the mean of the real entries
+        "lengths": numpy.frombuffer(lengths, dtype=numpy.int32).reshape(-1, top_n)[first:].sum(axis=1)
+        / numpy.maximum(numpy.frombuffer(filled, dtype=numpy.int32)[first:], 1),
+    }
+    # Samples are time-ordered, so each bucket is one contiguous slice
+    edges = numpy.searchsorted(t, start + width * numpy.arange(buckets + 1))
+    edges[-1] = len(t)
+    result = []
+    for b in range(buckets):
+        lo, hi = int(edges[b]), int(edges[b + 1])
+        bucket = _empty_bucket(start + b * width)
+        if hi > lo:
+            bucket["samples"] = hi - lo
+            for name, column in columns.items():
+                chunk = column[lo:hi]
+                bucket[name] = {"min": float(chunk.min()), "max": float(chunk.max()), "mean": round(float(chunk.mean()), 2)}
+        result.append(bucket)
+    return result
+
+
+def _downsample_python(times, top, snakes, lengths, filled, top_n, start, width, buckets):
+    grouped = [([], [], []) for _ in range(buckets)]
+    for i, t in enumerate(times):
+        if t < start:
+            continue
+        b = min(int((t - start) // width), buckets - 1)
+        row = lengths[i * top_n:(i + 1) * top_n]
+        grouped[b][0].append(top[i])
+        grouped[b][1].append(snakes[i])
+        grouped[b][2].append(sum(row) / filled[i] if filled[i] else 0)
+    result = []
+    for b, columns in enumerate(grouped):
+        bucket = _empty_bucket(start + b * width)
+        if columns[0]:
+            bucket["samples"] = len(columns[0])
+            for name, values in zip(("top", "snakes", "lengths"), columns):
+                bucket[name] = {"min": float(min(values)), "max": float(max(values)), "mean": round(sum(values) / len(values), 2)}
+        result.append(bucket)
+    return result
+
+
+class HistoryStore:
+    """Per-server score history fed by every polled snapshot."""
+
+    def __init__(self, cache, keys, capacity=HISTORY_CAPACITY, sample_interval=HISTORY_SAMPLE_INTERVAL,
+                 top_n=HISTORY_TOP_N, clock=time.time):
+        self.keys = frozenset(keys)  # Only servers the bot knows about are recorded
+        self.capacity = capacity
+        self.sample_interval = sample_interval
+        self.top_n = top_n
+        self.clock = clock
+        self._servers = {}
+        self._last_sample = None
+        self.samples = 0
+        cache.add_listener(self.on_snapshot)
+
+    def on_snapshot(self, old, new):
+        now = self.clock()
+        if self._last_sample is not None and now - self._last_sample < self.sample_interval:
+            return
+        self._last_sample = now
+        for key in self.keys:
+            board = new.servers.get(key)
+            if board is None:
+                continue
+            history = self._servers.get(key)
+            if history is None:
+                history = self._servers[key] = ServerHistory(self.capacity, self.top_n)
+            history.append(now, board)
+        self.samples += 1
+
+    def downsample(self, key, window=86400, buckets=24):
+        """Return min/max/mean of top score, snakeCount and mean top-N length per time bucket."""
+        history = self._servers.get(key)
+        end = self.clock()
+        start = end - window
+        width = window / buckets
+        if history is None or not history.count:
+            return [_empty_bucket(start + b * width) for b in range(buckets)]
+        columns = history.ordered()
+        if numpy is not None:
+            return _downsample_numpy(*columns, history.top_n, start, width, buckets)
+        return _downsample_python(*columns, history.top_n, start, width, buckets)
+
+    def stats(self):
+        return {
+            "servers": len(self._servers),
+            "samples": self.samples,
+            "capacity": self.capacity,
+            "sample_interval": self.sample_interval,
+            "bytes": sum(
+                h.times.itemsize * len(h.times) + h.top.itemsize * len(h.top)
+                + h.snakes.itemsize * len(h.snakes) + h.lengths.itemsize * len(h.lengths)
+                + h.filled.itemsize * len(h.filled)
+                for h in self._servers.values()
+            ),
+            "backend": "numpy" if numpy is not None else "python",
+        }
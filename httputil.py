@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import time
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+
+
+def accepted_encodings(accept_encoding):
+    """Content codings in an Accept-Encoding header; a q=0 token refuses that coding."""
+    accepted = set()
+    for token in accept_encoding.split(","):
+        coding, _, params = token.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class Page:
+    """An HTML body with its strong ETag and lazily built compressed variants."""
+
+    __slots__ = ("text", "body", "etag", "_gzip", "_br")
+
+    def __init__(self, text):
+        self.text = text
+        self.body = text.encode("utf-8")
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=16).hexdigest() + '"'
+        self._gzip = None
+        self._br = None
+
+    def encoded(self, accept_encoding):
+        """Return (content_encoding, etag, body) for the best encoding the client accepts."""
+        if len(self.body) >= COMPRESS_MIN_SIZE and accept_encoding:
+            accepted = accepted_encodings(accept_encoding)
+            if brotli is not None and "br" in accepted:
+                if self._br is None:
+                    self._br = brotli.compress(self.body, quality=5)
+                return "br", self.etag[:-1] + '-br"', self._br
+            if "gzip" in accepted:
+                if self._gzip is None:
+                    self._gzip = gzip.compress(self.body, compresslevel=6, mtime=0)
+                return "gzip", self.etag[:-1] + '-gz"', self._gzip
+        return None, self.etag, self.body
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def conditional_response(page, request_headers, max_age=5):
+    """Build (status, headers, body) for a Page, honouring If-None-Match and Accept-Encoding."""
+    encoding, etag, body = page.encoded(request_headers.get("Accept-Encoding", ""))
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request_headers.get("If-None-Match"), etag):
+        return 304, headers, b""
+    headers["Content-Type"] = "text/html; charset=utf-8"
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return 200, headers, body
+
+
+class RequestStats:
+    """Request counters shared by the Flask and aiohttp frontends."""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.requests = 0
+        self.not_modified = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, status, duration):
+        self.requests += 1
+        if status == 304:
+            self.not_modified += 1
+        self.total_time += duration
+        if duration > self.max_time:
+            self.max_time = duration
+
+    def stats(self):
+        uptime = time.monotonic() - self.started_at
+        return {
+            "requests": self.requests,
+            "not_modified": self.not_modified,
+            "requests_per_second": round(self.requests / uptime, 3) if uptime else 0.0,
+            "mean_ms": round(self.total_time / self.requests * 1000, 3) if self.requests else 0.0,
+            "max_ms": round(self.max_time * 1000, 3),
+        }
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import os
+import time
+
+import aiohttp
+
+from metrics import UPSTREAM_FETCH_SECONDS, UPSTREAM_PAYLOAD_BYTES
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:  # orjson is in requirements.txt; the stdlib decoder covers installs without it
+    import json
+    _loads = json.loads
+
+logger = logging.getLogger('SlitherBot')
+
+LEADERBOARD_URL = os.getenv("LEADERBOARD_URL", "https://slither-realtime-leaderboard.pages.dev/api/leaderboard")
+LEADERBOARD_POLL_INTERVAL = float(os.getenv("LEADERBOARD_POLL_INTERVAL", "10"))  # Background poll period, 0 disables
+# Seconds a snapshot is served as fresh. It defaults to the poll period, so reads between polls never fetch on
+# their own; a read while a poll is in flight shares that fetch
+LEADERBOARD_TTL = float(os.getenv("LEADERBOARD_TTL", str(LEADERBOARD_POLL_INTERVAL or 5)))
+LEADERBOARD_MAX_STALE = float(os.getenv("LEADERBOARD_MAX_STALE", "30"))  # Extra seconds served stale while refreshing
+LEADERBOARD_TOP_N = int(os.getenv("LEADERBOARD_TOP_N", "10"))  # Entries kept per server
+
+
+class LeaderboardError(Exception):
+    pass
+
+
+class LeaderboardFormatError(LeaderboardError):
+    pass
+
+
+class Entry:
+    __slots__ = ("nk", "len", "place")
+
+    def __init__(self, nk, len, place):
+        self.nk = nk
+        self.len = len
+        self.place = place
+
+
+class ServerBoard:
+    __slots__ = ("ipv4", "port", "snake_count", "entries")
+
+    def __init__(self, ipv4, port, snake_count, entries):
+        self.ipv4 = ipv4
+        self.port = port
+        self.snake_count = snake_count
+        self.entries = entries
+
+    def top(self):
+        return tuple((e.nk, e.len, e.place) for e in self.entries)
+
+    def to_dict(self):
+        return {
+            "snakeCount": self.snake_count,
+            "leaderboard": [{"nk": e.nk, "len": e.len, "place": e.place} for e in self.entries],
+        }
+
+
+class Snapshot:
+    """Compact view of one leaderboard payload, indexed by (ipv4, port)."""
+
+    __slots__ = ("version", "fetched_at", "servers")
+
+    def __init__(self, version, fetched_at, servers):
+        self.version = version
+        self.fetched_at = fetched_at
+        self.servers = servers
+
+    def get(self, ip, port):
+        return self.servers.get((ip, str(port)))
+
+    def __len__(self):
+        return len(self.servers)
+
+
+def diff_snapshots(old, new):
+    """Return ({key: board} for new or changed servers, [keys] of removed servers)."""
+    if old is None:
+        return dict(new.servers), []
+    changed = {}
+    for key, board in new.servers.items():
+        previous = old.servers.get(key)
+        if previous is None or previous.snake_count != board.snake_count or previous.top() != board.top():
+            changed[key] = board
+    removed = [key for key in old.servers if key not in new.servers]
+    return changed, removed
+
+
+def parse_snapshot(payload, version=0, fetched_at=None, top_n=LEADERBOARD_TOP_N):
+    try:
+        data = _loads(payload)
+    except ValueError as e:
+        raise LeaderboardFormatError(f"Invalid JSON in API response: {str(e)}") from e
+    if not isinstance(data, dict) or not isinstance(data.get("dataList"), list):
+        raise LeaderboardFormatError("dataList not found in API response")
+
+    # Keep only the fields we read; the decoded payload is dropped right after
+    servers = {}
+    try:
+        for server in data["dataList"]:
+            # Malformed servers and entries are skipped so one bad record cannot fail the whole snapshot
+            if not isinstance(server, dict):
+                continue
+            ip = server.get("ipv4")
+            if not ip:
+                continue
+            port = str(server.get("po", ""))
+            board = server.get("leaderboard")
+            players = [p for p in board if isinstance(p, dict)] if isinstance(board, list) else ()
+            entries = tuple(
+                Entry(p.get("nk", "Unknown"), p.get("len", 0), p.get("place", "?"))
+                for p in players[:top_n]
+            )
+            servers[(ip, port)] = ServerBoard(ip, port, server.get("snakeCount", 0), entries)
+    except (AttributeError, TypeError) as e:
+        raise LeaderboardFormatError(f"Unexpected server record in API response: {str(e)}") from e
+    return Snapshot(version, fetched_at, servers)
+
+
+class LeaderboardClient:
+    """Long-lived aiohttp client for the realtime leaderboard API."""
+
+    def __init__(self, url=LEADERBOARD_URL, timeout=10, retries=2, backoff=0.5):
+        self.url = url
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=min(timeout, 5))
+        self.retries = retries
+        self.backoff = backoff
+        self._session = None
+
+    async def start(self):
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=20,
+            limit_per_host=10,
+            ttl_dns_cache=300,  # Cache DNS lookups for 5 minutes
+            keepalive_timeout=60,  # Keep pooled connections warm between polls
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=self.timeout,
+            headers={"Accept": "application/json", "User-Agent": "SlitherBot"},
+        )
+        logger.info("Leaderboard HTTP session started")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("Leaderboard HTTP session closed")
+        self._session = None
+
+    async def fetch(self):
+        if self._session is None or self._session.closed:
+            raise LeaderboardError("Leaderboard client is not started")
+
+        last_error = None
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                async with self._session.get(self.url) as response:
+                    response.raise_for_status()
+                    body = await response.read()
+                UPSTREAM_FETCH_SECONDS.observe(time.perf_counter() - started, "ok")
+                UPSTREAM_PAYLOAD_BYTES.observe(len(body))
+                return body
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                UPSTREAM_FETCH_SECONDS.observe(time.perf_counter() - started, "error")
+                last_error = e
+                logger.warning(f"Leaderboard fetch attempt {attempt + 1} failed: {e!r}")
+                if attempt < self.retries:
+                    await asyncio.sleep(self.backoff * (2 ** attempt))
+        raise LeaderboardError(f"Failed to fetch leaderboard after {self.retries + 1} attempts: {last_error!r}")
+
+
+class LeaderboardCache:
+    """TTL snapshot cache with stale-while-revalidate and single-flight refreshes."""
+
+    def __init__(self, client, ttl=LEADERBOARD_TTL, max_stale=LEADERBOARD_MAX_STALE):
+        self.client = client
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.snapshot = None
+        self.version = 0
+        self.fetched_at = None
+        self._inflight = None
+        self._listeners = []
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.errors = 0
+
+    @property
+    def age(self):
+        if self.fetched_at is None:
+            return None
+        return time.monotonic() - self.fetched_at
+
+    async def get(self):
+        age = self.age
+        if age is not None and age < self.ttl:
+            self.hits += 1
+            return self.snapshot
+
+        if (age is None and self.snapshot is not None) or (age is not None and age < self.ttl + self.max_stale):
+            # Serve the stale (or primed) snapshot right away and refresh in the background
+            self.stale_hits += 1
+            self._refresh()
+            return self.snapshot
+
+        self.misses += 1
+        return await asyncio.shield(self._refresh())
+
+    async def refresh(self):
+        return await asyncio.shield(self._refresh())
+
+    def prime(self, snapshot):
+        """Seed the cache with a snapshot restored from disk.
+
+        It is never treated as fresh: get() serves it as a stale snapshot and
+        fetches live data in the background, so commands do not wait on (or
+        fail with) the upstream while the bot starts.
+        """
+        if self.snapshot is None:
+            self.snapshot = snapshot
+            self.version = snapshot.version
+
+    def add_listener(self, callback):
+        """Call callback(old_snapshot, new_snapshot) on the event loop after every successful refresh."""
+        self._listeners.append(callback)
+
+    def _refresh(self):
+        # Every caller shares the same in-flight fetch
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._load())
+            self._inflight.add_done_callback(self._refresh_done)
+        return self._inflight
+
+    def _refresh_done(self, task):
+        self._inflight = None
+        if not task.cancelled():
+            task.exception()  # Mark background failures as retrieved; _load already logged them
+
+    async def _load(self):
+        self.refreshes += 1
+        try:
+            payload = await self.client.fetch()
+            fetched_at = time.monotonic()
+            snapshot = parse_snapshot(payload, version=self.version + 1, fetched_at=fetched_at)
+        except LeaderboardError as e:
+            self.errors += 1
+            logger.error(f"Leaderboard refresh failed: {str(e)}")
+            raise
+        old = self.snapshot
+        self.snapshot = snapshot
+        self.version = snapshot.version
+        self.fetched_at = fetched_at
+        for callback in self._listeners:
+            try:
+                callback(old, snapshot)
+            except Exception:
+                logger.exception(f"Snapshot listener {callback!r} failed")
+        return snapshot
+
+    def stats(self):
+        age = self.age
+        return {
+            "version": self.version,
+            "age": round(age, 3) if age is not None else None,
+            "ttl": self.ttl,
+            "max_stale": self.max_stale,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+            "inflight": self._inflight is not None,
+        }
+
+
+async def poll_leaderboard(cache, interval=LEADERBOARD_POLL_INTERVAL):
+    """Refresh the cache on a fixed interval so every consumer shares one upstream request."""
+    while True:
+        try:
+            await cache.refresh()
+        except LeaderboardError:
+            pass  # Already logged by the cache; keep serving the last good snapshot
+        except Exception:
+            logger.exception("Leaderboard poll failed")  # Keep polling; a dead poller freezes every consumer
+        await asyncio.sleep(interval)
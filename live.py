@@ -0,0 +1,98 @@
+import asyncio
+import json
+import logging
+
+from leaderboard import diff_snapshots
+
+logger = logging.getLogger('SlitherBot')
+
+LIVE_QUEUE_SIZE = 32  # Pending events per viewer before it is resynced with a full snapshot
+LIVE_HEARTBEAT = 15  # Seconds between keep-alive comments on idle streams
+
+_RESYNC = object()
+
+
+def server_id(key):
+    return f"{key[0]}:{key[1]}"
+
+
+def sse_event(event, payload):
+    data = json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+    return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+
+
+class LiveViewer:
+    __slots__ = ("queue",)
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+
+
+class LiveHub:
+    """Fans one upstream poll out to every connected viewer as Server-Sent Events.
+
+    Viewers get one full snapshot on connect and then only the servers that
+    changed. Each event is encoded once, however many viewers are connected.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.viewers = set()
+        self._snapshot_event = (None, None)
+        self.events_published = 0
+        self.resyncs = 0
+        cache.add_listener(self.publish)
+
+    def snapshot_event(self):
+        snapshot = self.cache.snapshot
+        version = snapshot.version if snapshot is not None else 0
+        cached_version, event = self._snapshot_event
+        if cached_version != version:
+            servers = {server_id(key): board.to_dict() for key, board in snapshot.servers.items()} if snapshot else {}
+            event = sse_event("snapshot", {"version": version, "servers": servers})
+            self._snapshot_event = (version, event)
+        return event
+
+    def publish(self, old, new):
+        if not self.viewers:
+            return
+        changed, removed = diff_snapshots(old, new)
+        if not changed and not removed:
+            return
+        event = sse_event("diff", {
+            "version": new.version,
+            "changed": {server_id(key): board.to_dict() for key, board in changed.items()},
+            "removed": [server_id(key) for key in removed],
+        })
+        self.events_published += 1
+        for viewer in self.viewers:
+            try:
+                viewer.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # A slow viewer skips the backlog and gets a fresh snapshot instead
+                self.resyncs += 1
+                while not viewer.queue.empty():
+                    viewer.queue.get_nowait()
+                viewer.queue.put_nowait(_RESYNC)
+
+    async def stream(self, response):
+        """Write events to a prepared aiohttp StreamResponse until the viewer disconnects."""
+        viewer = LiveViewer()
+        self.viewers.add(viewer)
+        try:
+            await response.write(self.snapshot_event())
+            while True:
+                try:
+                    event = await asyncio.wait_for(viewer.queue.get(), LIVE_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    event = b": ping\n\n"
+                if event is _RESYNC:
+                    event = self.snapshot_event()
+                await response.write(event)
+        except ConnectionResetError:
+            pass  # Viewer went away
+        finally:
+            self.viewers.discard(viewer)
+
+    def stats(self):
+        return {"viewers": len(self.viewers), "events_published": self.events_published, "resyncs": self.resyncs}
@@ -0,0 +1,171 @@
+import asyncio
+import bisect
+import logging
+import os
+
+logger = logging.getLogger('SlitherBot')
+
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))  # Seconds between event-loop lag samples, 0 disables
+LOOP_LAG_WARN = float(os.getenv("LOOP_LAG_WARN", "0.25"))  # Lag in seconds that gets logged as a blocked loop
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, optionally split by a fixed set of labels."""
+
+    type = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self):
+        for labelvalues, value in list(self._values.items()):
+            yield self.name, _labels(self.labelnames, labelvalues), value
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus exposition format.
+
+    Each observation is one bisect and three additions; buckets are only
+    summed into cumulative counts when scraped.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value, *labelvalues):
+        series = self._series.get(labelvalues)
+        if series is None:
+            series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def count(self, *labelvalues):
+        series = self._series.get(labelvalues)
+        return sum(series[0]) if series is not None else 0
+
+    def samples(self):
+        for labelvalues, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), list(counts)):
+                cumulative += count
+                le = (("le", _format_value(float(bound))),)
+                yield f"{self.name}_bucket", _labels(self.labelnames, labelvalues, le), cumulative
+            yield f"{self.name}_sum", _labels(self.labelnames, labelvalues), total
+            yield f"{self.name}_count", _labels(self.labelnames, labelvalues), cumulative
+
+
+class CallbackMetric:
+    """Counter or gauge read from existing state when scraped, e.g. a cache's stats() dict."""
+
+    def __init__(self, name, help, callback, type="gauge"):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.type = type
+
+    def samples(self):
+        yield self.name, "", self.callback()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, buckets=LATENCY_BUCKETS, labelnames=()):
+        return self.register(Histogram(name, help, buckets, labelnames))
+
+    def callback(self, name, help, callback, type="gauge"):
+        return self.register(CallbackMetric(name, help, callback, type))
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            try:
+                for name, labels, value in metric.samples():
+                    lines.append(f"{name}{labels} {_format_value(value)}")
+            except Exception as e:
+                logger.error(f"Failed to collect metric {metric.name}: {str(e)}")
+        lines.append("")
+        return "\n".join(lines)
+
+
+# Process-wide registry; hot-path metrics are defined here so modules can record without extra wiring
+registry = MetricsRegistry()
+
+UPSTREAM_FETCH_SECONDS = registry.histogram(
+    "slitherbot_upstream_fetch_seconds", "Leaderboard API request time per attempt.", labelnames=("outcome",))
+UPSTREAM_PAYLOAD_BYTES = registry.histogram(
+    "slitherbot_upstream_payload_bytes", "Leaderboard API response body size.", buckets=SIZE_BUCKETS)
+COMMAND_SECONDS = registry.histogram(
+    "slitherbot_command_seconds", "Time to handle a chat command, including replies.", labelnames=("command",))
+COMMAND_ERRORS = registry.counter(
+    "slitherbot_command_errors_total", "Chat commands that raised an unexpected error.", labelnames=("command",))
+DISCORD_SEND_SECONDS = registry.histogram(
+    "slitherbot_discord_request_seconds", "Discord API time to send or edit a message.", labelnames=("action",))
+RATE_LIMIT_WAIT_SECONDS = registry.histogram(
+    "slitherbot_rate_limit_wait_seconds", "Time an outbound message waited for a rate-limit token.",
+    buckets=(0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0), labelnames=("action",))
+LOOP_LAG_SECONDS = registry.histogram(
+    "slitherbot_event_loop_lag_seconds", "Delay between a watchdog wakeup being due and running.")
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "slitherbot_http_request_seconds", "Web frontend request time.", labelnames=("status",))
+
+
+async def watch_loop_lag(interval=LOOP_LAG_INTERVAL, warn=LOOP_LAG_WARN):
+    """Sample how late the event loop runs a timer; a blocked loop shows up as lag."""
+    loop = asyncio.get_running_loop()
+    while True:
+        due = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - due)
+        LOOP_LAG_SECONDS.observe(lag)
+        if lag >= warn:
+            logger.warning(f"Event loop lagged {lag * 1000:.0f} ms")
@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import time
+
+from metrics import DISCORD_SEND_SECONDS, RATE_LIMIT_WAIT_SECONDS
+
+logger = logging.getLogger('SlitherBot')
+
+# Discord allows 5 messages per 5 s in a channel and 50 requests/s per bot overall
+CHANNEL_RATE = float(os.getenv("OUTBOX_CHANNEL_RATE", "1"))  # Messages per second per channel
+CHANNEL_BURST = int(os.getenv("OUTBOX_CHANNEL_BURST", "5"))
+GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "50"))
+GLOBAL_BURST = int(os.getenv("OUTBOX_GLOBAL_BURST", "50"))
+COALESCE_WINDOW = float(os.getenv("OUTBOX_COALESCE_WINDOW", "2"))  # Seconds an identical keyed reply is reused
+
+_PRUNE_SIZE = 1024  # Idle channel state is swept once this many channels are tracked
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, now):
+        """Take a token and return how long to wait before using it (0 when one is available)."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def is_full(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class Outbox:
+    """Sends channel messages under per-channel and global token buckets.
+
+    Replies are sent at once while a channel is idle. A keyed reply (e.g. the
+    same server's leaderboard for the same snapshot) that is already waiting
+    for a token, or was just sent to that channel, is shared instead of being
+    sent again.
+    """
+
+    def __init__(self, channel_rate=CHANNEL_RATE, channel_burst=CHANNEL_BURST,
+                 global_rate=GLOBAL_RATE, global_burst=GLOBAL_BURST,
+                 coalesce_window=COALESCE_WINDOW, clock=time.monotonic):
+        self.channel_rate = channel_rate
+        self.channel_burst = channel_burst
+        self.coalesce_window = coalesce_window
+        self.clock = clock
+        self.global_bucket = TokenBucket(global_rate, global_burst, clock())
+        self._channel_buckets = {}
+        self._pending = {}
+        self._recent = {}
+        self.sent = 0
+        self.edited = 0
+        self.coalesced = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _channel_bucket(self, channel_id, now):
+        bucket = self._channel_buckets.get(channel_id)
+        if bucket is None:
+            if len(self._channel_buckets) >= _PRUNE_SIZE:
+                self._prune(now)
+            bucket = self._channel_buckets[channel_id] = TokenBucket(self.channel_rate, self.channel_burst, now)
+        return bucket
+
+    def _prune(self, now):
+        self._channel_buckets = {cid: b for cid, b in self._channel_buckets.items() if not b.is_full(now)}
+        self._prune_recent(now)
+
+    def _prune_recent(self, now):
+        self._recent = {slot: r for slot, r in self._recent.items() if now - r[0] < self.coalesce_window}
+
+    async def send(self, channel, content, key=None):
+        """Send content to channel; returns the sent message, or the shared one for a coalesced reply."""
+        now = self.clock()
+        if key is not None:
+            slot = (channel.id, key)
+            pending = self._pending.get(slot)
+            if pending is not None:
+                self.coalesced += 1
+                return await asyncio.shield(pending)
+            recent = self._recent.get(slot)
+            if recent is not None and now - recent[0] < self.coalesce_window:
+                self.coalesced += 1
+                return recent[1]
+
+        wait = max(self._channel_bucket(channel.id, now).reserve(now), self.global_bucket.reserve(now))
+        if key is None:
+            return await self._deliver(channel, content, wait)
+
+        task = asyncio.ensure_future(self._deliver(channel, content, wait))
+        self._pending[slot] = task
+        task.add_done_callback(lambda t: self._delivered(slot, t))
+        return await asyncio.shield(task)
+
+    async def edit(self, message, content):
+        """Edit a previously sent message, drawing from the same channel and global buckets."""
+        now = self.clock()
+        channel_id = message.channel.id
+        wait = max(self._channel_bucket(channel_id, now).reserve(now), self.global_bucket.reserve(now))
+        RATE_LIMIT_WAIT_SECONDS.observe(wait, "edit")
+        if wait > 0:
+            self.delayed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            await asyncio.sleep(wait)
+        started = time.perf_counter()
+        await message.edit(content=content)
+        DISCORD_SEND_SECONDS.observe(time.perf_counter() - started, "edit")
+        self.edited += 1
+
+    def _delivered(self, slot, task):
+        self._pending.pop(slot, None)
+        if not task.cancelled() and task.exception() is None:
+            now = self.clock()
+            if len(self._recent) >= _PRUNE_SIZE:
+                self._prune_recent(now)
+            self._recent[slot] = (now, task.result())
+
+    async def _deliver(self, channel, content, wait):
+        RATE_LIMIT_WAIT_SECONDS.observe(wait, "send")
+        if wait > 0:
+            self.delayed += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            logger.info(f"Outbound rate limit: delaying message to channel {channel.id} by {wait:.2f}s")
+            await asyncio.sleep(wait)
+        started = time.perf_counter()
+        message = await channel.send(content)
+        DISCORD_SEND_SECONDS.observe(time.perf_counter() - started, "send")
+        self.sent += 1
+        return message
+
+    def stats(self):
+        return {
+            "sent": self.sent,
+            "edited": self.edited,
+            "coalesced": self.coalesced,
+            "delayed": self.delayed,
+            "total_wait": round(self.total_wait, 3),
+            "max_wait": round(self.max_wait, 3),
+            "channels": len(self._channel_buckets),
+            "pending": len(self._pending),
+        }
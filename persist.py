@@ -0,0 +1,207 @@
+import asyncio
+import glob
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+import zlib
+
+from leaderboard import Entry, ServerBoard, Snapshot
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; snapshots fall back to compressed JSON
+    msgpack = None
+
+logger = logging.getLogger('SlitherBot')
+
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "slitherbot"))
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))  # Snapshot files kept on disk
+
+_MAGIC = b"SLB1"
+_HEADER = struct.Struct("<4scQd")  # magic, body format, snapshot version, wall-clock save time
+LATEST_PAGE_FILE = "latest.html"
+
+
+def _encode(obj):
+    if msgpack is not None:
+        return b"M", msgpack.packb(obj, use_bin_type=True)
+    return b"J", json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _decode(fmt, body):
+    if fmt == b"M":
+        if msgpack is None:
+            raise ValueError("snapshot was written with msgpack, which is not installed")
+        return msgpack.unpackb(body, raw=False)
+    if fmt == b"J":
+        return json.loads(body)
+    raise ValueError(f"unknown snapshot format {fmt!r}")
+
+
+def encode_servers(snapshot):
+    return [
+        [ip, port, board.snake_count, [[e.nk, e.len, e.place] for e in board.entries]]
+        for (ip, port), board in snapshot.servers.items()
+    ]
+
+
+def decode_servers(rows):
+    servers = {}
+    for ip, port, snake_count, entries in rows:
+        servers[(ip, port)] = ServerBoard(ip, port, snake_count, tuple(Entry(nk, length, place) for nk, length, place in entries))
+    return servers
+
+
+def atomic_write(path, data):
+    """Write data to a temp file next to path, then rename it over path."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SnapshotStore:
+    """Persists recent snapshots and the latest page for warm restarts.
+
+    Encoding and writes run in the default executor; a write is skipped when
+    the content hash matches what is already on disk.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR, keep=SNAPSHOT_KEEP):
+        self.directory = directory
+        self.keep = keep
+        self._last_digest = None
+        self._last_page_etag = None
+        self._pending = {}
+        self._writer = None
+        self.writes = 0
+        self.skipped = 0
+        self.errors = 0
+
+    def _snapshot_path(self, version):
+        return os.path.join(self.directory, f"snapshot-{version:012d}.bin")
+
+    def _snapshot_files(self):
+        """Snapshot files, newest write first.
+
+        Ordered by mtime rather than by name: after a cold start the version
+        restarts at 1, and names from an earlier run (unreadable ones, say
+        msgpack files on an install without msgpack) would otherwise outrank
+        every new file and get each one pruned right after it is written.
+        """
+        paths = []
+        for path in glob.glob(os.path.join(self.directory, "snapshot-*.bin")):
+            try:
+                paths.append((os.stat(path).st_mtime_ns, path))
+            except OSError:
+                pass  # Pruned or replaced meanwhile
+        return [path for _, path in sorted(paths, reverse=True)]
+
+    def load(self):
+        """Return (snapshot, page_text) from the newest readable files; either may be None."""
+        snapshot = None
+        for path in self._snapshot_files():
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                magic, fmt, version, saved_at = _HEADER.unpack_from(data)
+                if magic != _MAGIC:
+                    raise ValueError("bad magic")
+                body = zlib.decompress(data[_HEADER.size:])
+                snapshot = Snapshot(version, None, decode_servers(_decode(fmt, body)))
+                self._last_digest = hashlib.blake2b(body, digest_size=16).digest()
+                logger.info(f"Loaded snapshot v{version} from {path} (saved {time.time() - saved_at:.0f}s ago)")
+                break
+            except (OSError, ValueError, struct.error, zlib.error) as e:
+                logger.warning(f"Skipping unreadable snapshot {path}: {str(e)}")
+
+        return snapshot, self.load_page()
+
+    def page_mtime(self):
+        try:
+            return os.stat(os.path.join(self.directory, LATEST_PAGE_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+    def load_page(self):
+        try:
+            with open(os.path.join(self.directory, LATEST_PAGE_FILE), encoding="utf-8") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def save_snapshot(self, snapshot):
+        self._schedule("snapshot", snapshot)
+
+    def save_page(self, page):
+        pending = self._pending.get("page")
+        if page.etag == (pending.etag if pending is not None else self._last_page_etag):
+            self.skipped += 1
+            return
+        self._schedule("page", page)
+
+    def _schedule(self, kind, item):
+        # Only the newest item of each kind is written; older queued ones are superseded
+        self._pending[kind] = item
+        if self._writer is None:
+            self._writer = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending:
+                kind, item = self._pending.popitem()
+                write = self._write_snapshot if kind == "snapshot" else self._write_page
+                try:
+                    await loop.run_in_executor(None, write, item)
+                except Exception as e:
+                    self.errors += 1
+                    logger.error(f"Failed to persist {kind}: {str(e)}")
+        finally:
+            self._writer = None
+
+    def _write_snapshot(self, snapshot):
+        fmt, body = _encode(encode_servers(snapshot))
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if digest == self._last_digest:
+            self.skipped += 1
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        header = _HEADER.pack(_MAGIC, fmt, snapshot.version, time.time())
+        atomic_write(self._snapshot_path(snapshot.version), header + zlib.compress(body, 6))
+        self._last_digest = digest
+        self.writes += 1
+        for old in self._snapshot_files()[self.keep:]:
+            try:
+                os.unlink(old)
+            except OSError:
+                pass
+
+    def _write_page(self, page):
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(os.path.join(self.directory, LATEST_PAGE_FILE), page.body)
+        self._last_page_etag = page.etag  # Only once it is on disk, so a failed write is retried
+        self.writes += 1
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "format": "msgpack" if msgpack is not None else "json",
+            "writes": self.writes,
+            "skipped": self.skipped,
+            "errors": self.errors,
+        }
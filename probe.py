@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+logger = logging.getLogger('SlitherBot')
+
+PROBE_TIMEOUT = float(os.getenv("PROBE_TIMEOUT", "2"))  # Seconds before a TCP connect counts as lost
+PROBE_CONCURRENCY = int(os.getenv("PROBE_CONCURRENCY", "20"))  # Connects in flight at once
+PROBE_WINDOW = int(os.getenv("PROBE_WINDOW", "20"))  # Results kept per endpoint
+PROBE_TTL = float(os.getenv("PROBE_TTL", "60"))  # Seconds a probe result is reused before reprobing
+PROBE_INTERVAL = float(os.getenv("PROBE_INTERVAL", "300"))  # Background sweep period, 0 disables
+RTT_BUCKET = 0.02  # RTTs within 20 ms of each other rank as equal, then snakeCount decides
+
+
+async def tcp_connect(host, port, timeout):
+    _, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+
+
+class EndpointStats:
+    __slots__ = ("rtts", "probed_at")
+
+    def __init__(self, window):
+        self.rtts = deque(maxlen=window)  # RTT in seconds, None for a failed connect
+        self.probed_at = None
+
+    def record(self, rtt, now):
+        self.rtts.append(rtt)
+        self.probed_at = now
+
+    def percentile(self, q):
+        samples = sorted(rtt for rtt in self.rtts if rtt is not None)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def loss(self):
+        if not self.rtts:
+            return None
+        return sum(1 for rtt in self.rtts if rtt is None) / len(self.rtts)
+
+    def to_dict(self):
+        p50 = self.percentile(0.5)
+        p90 = self.percentile(0.9)
+        loss = self.loss()
+        return {
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p90_ms": round(p90 * 1000, 1) if p90 is not None else None,
+            "loss": round(loss, 3) if loss is not None else None,
+            "samples": len(self.rtts),
+        }
+
+
+class LatencyProber:
+    """Concurrent TCP connect prober with rolling per-endpoint RTT percentiles."""
+
+    def __init__(self, connect=tcp_connect, timeout=PROBE_TIMEOUT, concurrency=PROBE_CONCURRENCY,
+                 window=PROBE_WINDOW, ttl=PROBE_TTL, clock=time.monotonic):
+        self.connect = connect
+        self.timeout = timeout
+        self.window = window
+        self.ttl = ttl
+        self.clock = clock
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._endpoints = {}
+        self._inflight = {}
+        self.probes = 0
+        self.failures = 0
+
+    def endpoint(self, key):
+        stats = self._endpoints.get(key)
+        if stats is None:
+            stats = self._endpoints[key] = EndpointStats(self.window)
+        return stats
+
+    def is_fresh(self, key):
+        stats = self._endpoints.get(key)
+        return stats is not None and stats.probed_at is not None and self.clock() - stats.probed_at < self.ttl
+
+    async def probe_one(self, server):
+        # Concurrent requests for the same endpoint share one connect
+        task = self._inflight.get(server.key)
+        if task is None:
+            task = self._inflight[server.key] = asyncio.ensure_future(self._probe(server))
+            task.add_done_callback(lambda _: self._inflight.pop(server.key, None))
+        await asyncio.shield(task)
+
+    async def _probe(self, server):
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                await self.connect(server.ip, server.port, self.timeout)
+                rtt = time.perf_counter() - started
+            except (OSError, asyncio.TimeoutError):
+                rtt = None
+                self.failures += 1
+        self.probes += 1
+        self.endpoint(server.key).record(rtt, self.clock())
+
+    async def probe(self, servers):
+        await asyncio.gather(*(self.probe_one(server) for server in servers))
+
+    async def ensure_fresh(self, servers):
+        await self.probe([server for server in servers if not self.is_fresh(server.key)])
+
+    def rank(self, servers, snapshot=None):
+        """Return [(server, stats, snake_count)] with reachable, low-RTT, busy servers first."""
+        ranked = []
+        for server in servers:
+            stats = self.endpoint(server.key)
+            board = snapshot.get(server.ip, server.port) if snapshot is not None else None
+            ranked.append((server, stats, board.snake_count if board is not None else None))
+
+        def sort_key(item):
+            _, stats, snakes = item
+            p50 = stats.percentile(0.5)
+            if p50 is None:
+                return (1, 0, 0)
+            return (0, int(p50 / RTT_BUCKET), -(snakes or 0))
+
+        ranked.sort(key=sort_key)
+        return ranked
+
+    def stats(self):
+        return {
+            "endpoints": len(self._endpoints),
+            "probes": self.probes,
+            "failures": self.failures,
+            "inflight": len(self._inflight),
+        }
+
+
+async def probe_forever(prober, servers, interval=PROBE_INTERVAL):
+    servers = list(servers)
+    while True:
+        started = time.perf_counter()
+        await prober.probe(servers)
+        logger.info(f"Probed {len(servers)} endpoints in {time.perf_counter() - started:.2f}s")
+        await asyncio.sleep(interval)
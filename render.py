@@ -0,0 +1,159 @@
+import html
+import os
+
+from httputil import Page
+
+PUBLIC_URL = os.getenv("PUBLIC_URL", "https://discord-bot-7ucy.onrender.com").rstrip("/")
+
+_PAGE_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>Slither.io Leaderboard Bot</title>
+    <link rel="stylesheet" href="/static/style.css">
+</head>
+<body>
+    <div class="container">
+        <h1>Slither.io Leaderboard Bot</h1>
+        """
+_PAGE_MIDDLE = """
+        <div id="leaderboard">
+            """
+_PAGE_TAIL = """
+        </div>
+    </div>
+    <script src="/static/script.js"></script>
+</body>
+</html>
+"""
+
+EMPTY_LEADERBOARD_HTML = "<p>No leaderboard data available.</p>"
+
+
+def discord_safe(text):
+    # A backtick in a nickname would close the ``` block the leaderboard is printed in
+    return str(text).replace("`", "ˋ")
+
+
+def render_map(registry):
+    parts = ["<h2>Slither.io Server Map</h2><div class='map'>"]
+    for country in registry.countries:
+        server = registry.servers(country)[0]  # One dot per country
+        label = html.escape(country.capitalize(), quote=True)
+        parts.append(
+            f"<div class='server-dot' style='left: {html.escape(server.x, quote=True)}; top: {html.escape(server.y, quote=True)};' "
+            f"title='{label} ({server.ip}:{server.port})'>{label}</div>"
+        )
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def server_path(server):
+    return f"/server/{server.ip}/{server.port}"
+
+
+def country_path(country):
+    return f"/country/{country}"
+
+
+class RenderedBoard:
+    __slots__ = ("discord", "html", "page")
+
+    def __init__(self, discord, html, page):
+        self.discord = discord
+        self.html = html
+        self.page = page
+
+
+class Renderer:
+    """Renders leaderboard replies and pages, cached per (server, snapshot version)."""
+
+    def __init__(self, registry, public_url=PUBLIC_URL):
+        self.registry = registry
+        self.public_url = public_url
+        self.map_html = render_map(registry)
+        # Everything but the leaderboard fragment is fixed between deploys
+        self._page_prefix = _PAGE_HEAD + self.map_html + _PAGE_MIDDLE
+        self._version = None
+        self._cache = {}
+        self.hits = 0
+        self.misses = 0
+
+    def page_text(self, leaderboard_html=None):
+        return self._page_prefix + (leaderboard_html or EMPTY_LEADERBOARD_HTML) + _PAGE_TAIL
+
+    def _cached(self, key, version, build):
+        # Keys carry the version so a render racing a snapshot swap (the web
+        # thread and the bot loop both call in here) can never be served later
+        cache = self._cache
+        if version != self._version:
+            cache = self._cache = {}
+            self._version = version
+        rendered = cache.get((key, version))
+        if rendered is not None:
+            self.hits += 1
+            return rendered
+        self.misses += 1
+        rendered = build()
+        cache[(key, version)] = rendered
+        return rendered
+
+    def leaderboard(self, server, board, version):
+        return self._cached(server.key, version, lambda: self._render_board(server, board))
+
+    def server_page(self, server, snapshot):
+        if snapshot is None:
+            return self.leaderboard(server, None, 0).page
+        return self.leaderboard(server, snapshot.get(server.ip, server.port), snapshot.version).page
+
+    def country_page(self, country, snapshot):
+        version = snapshot.version if snapshot is not None else 0
+
+        def build():
+            fragments = []
+            for server in self.registry.servers(country):
+                board = snapshot.get(server.ip, server.port) if snapshot is not None else None
+                fragments.append(self._board_html(server, board))
+            return Page(self.page_text("".join(fragments)))
+
+        return self._cached(("country", country), version, build)
+
+    def _title(self, server):
+        return f"Server: {server.ip}:{server.port} (Number: {server.number}) ({server.country.capitalize()})"
+
+    def _board_html(self, server, board):
+        title = html.escape(self._title(server))
+        if board is None:
+            return f"<h2>{title}</h2>{EMPTY_LEADERBOARD_HTML}"
+        items = "".join(
+            f"<li>{html.escape(str(p.place))}. {html.escape(str(p.nk))} - Score: {html.escape(str(p.len))}</li>"
+            for p in board.entries
+        )
+        return f"<h2>{title}</h2><ul>{items}</ul>"
+
+    def _render_board(self, server, board):
+        leaderboard_html = self._board_html(server, board)
+        page = Page(self.page_text(leaderboard_html))
+        if board is None:
+            return RenderedBoard(None, leaderboard_html, page)
+
+        lines = [
+            f"**Top 10 Players - {self._title(server)}**",
+            "```",
+            "🏆 Leaderboard 🏆",
+            "------------------",
+        ]
+        lines.extend(f"{p.place}. {discord_safe(p.nk)} - Score: {p.len}" for p in board.entries)
+        lines.extend([
+            "------------------",
+            "```",
+            "_Powered by Slither.io Bot_",
+            "",
+            f"**View Server Map**: [Click Here]({self.public_url}{server_path(server)})",
+            "",
+        ])
+        return RenderedBoard("\n".join(lines), leaderboard_html, page)
+
+    def stats(self):
+        return {"version": self._version, "entries": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,149 @@
+import bisect
+import unicodedata
+
+from leaderboard import diff_snapshots
+
+FUZZY_MIN_SCORE = 0.3  # Minimum trigram similarity for a fuzzy match
+
+
+def normalize_nick(nick):
+    return unicodedata.normalize("NFKC", str(nick)).casefold().strip()
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NickHit:
+    __slots__ = ("key", "nk", "place", "len")
+
+    def __init__(self, key, nk, place, len):
+        self.key = key
+        self.nk = nk
+        self.place = place
+        self.len = len
+
+    def to_dict(self):
+        return {"ip": self.key[0], "port": self.key[1], "nk": self.nk, "place": self.place, "len": self.len}
+
+
+class NickIndex:
+    """Inverted index from normalized nickname to leaderboard positions on every server.
+
+    Updated from snapshot diffs, so each poll only touches the servers whose
+    leaderboards changed. Supports exact, prefix and trigram fuzzy lookups.
+    """
+
+    def __init__(self, cache):
+        self._postings = {}  # normalized nick -> {server key: NickHit}
+        self._server_nicks = {}  # server key -> normalized nicks on that server
+        self._sorted = []  # Normalized nicks in order, for prefix scans
+        self._trigrams = {}  # trigram -> normalized nicks containing it
+        self._gram_counts = {}  # normalized nick -> number of distinct trigrams
+        self.updates = 0
+        cache.add_listener(self.on_snapshot)
+
+    def __len__(self):
+        return len(self._postings)
+
+    def on_snapshot(self, old, new):
+        changed, removed = diff_snapshots(old if self._server_nicks else None, new)
+        for key in removed:
+            self._remove_server(key)
+        for key, board in changed.items():
+            self._remove_server(key)
+            self._add_server(key, board)
+        self.updates += 1
+
+    def _add_server(self, key, board):
+        nicks = set()
+        for entry in board.entries:
+            norm = normalize_nick(entry.nk)
+            if not norm:
+                continue
+            postings = self._postings.get(norm)
+            if postings is None:
+                postings = self._postings[norm] = {}
+                bisect.insort(self._sorted, norm)
+                grams = trigrams(norm)
+                self._gram_counts[norm] = len(grams)
+                for gram in grams:
+                    self._trigrams.setdefault(gram, set()).add(norm)
+            if key not in postings:  # Keep the best place when a nick appears twice on one server
+                postings[key] = NickHit(key, entry.nk, entry.place, entry.len)
+            nicks.add(norm)
+        if nicks:
+            self._server_nicks[key] = nicks
+
+    def _remove_server(self, key):
+        for norm in self._server_nicks.pop(key, ()):
+            postings = self._postings[norm]
+            del postings[key]
+            if postings:
+                continue
+            del self._postings[norm]
+            del self._gram_counts[norm]
+            del self._sorted[bisect.bisect_left(self._sorted, norm)]
+            for gram in trigrams(norm):
+                grams = self._trigrams[gram]
+                grams.discard(norm)
+                if not grams:
+                    del self._trigrams[gram]
+
+    def _hits(self, norms, limit):
+        hits = []
+        for norm in norms:
+            hits.extend(self._postings[norm].values())
+            if len(hits) >= limit:
+                break
+        return hits[:limit]
+
+    def exact(self, query, limit=10):
+        norm = normalize_nick(query)
+        return self._hits([norm], limit) if norm in self._postings else []
+
+    def prefix(self, query, limit=10):
+        norm = normalize_nick(query)
+        if not norm:
+            return []
+        nicks = self._sorted
+        i = bisect.bisect_left(nicks, norm)
+        norms = []
+        while i < len(nicks) and len(norms) < limit and nicks[i].startswith(norm):
+            norms.append(nicks[i])
+            i += 1
+        return self._hits(norms, limit)
+
+    def fuzzy(self, query, limit=10):
+        norm = normalize_nick(query)
+        if not norm:
+            return []
+        grams = trigrams(norm)
+        shared = {}
+        for gram in grams:
+            for candidate in self._trigrams.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+        scored = []
+        for candidate, count in shared.items():
+            score = count / (len(grams) + self._gram_counts[candidate] - count)  # Jaccard similarity
+            if score >= FUZZY_MIN_SCORE:
+                scored.append((score, candidate))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return self._hits([candidate for _, candidate in scored], limit)
+
+    def find(self, query, limit=10):
+        """Return (mode, hits), trying exact, then prefix, then fuzzy matching."""
+        for mode, lookup in (("exact", self.exact), ("prefix", self.prefix), ("fuzzy", self.fuzzy)):
+            hits = lookup(query, limit)
+            if hits:
+                return mode, hits
+        return None, []
+
+    def stats(self):
+        return {
+            "nicks": len(self._postings),
+            "servers": len(self._server_nicks),
+            "trigrams": len(self._trigrams),
+            "updates": self.updates,
+        }
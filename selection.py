@@ -0,0 +1,78 @@
+import os
+import time
+from collections import OrderedDict
+
+SELECTION_MAX_USERS = int(os.getenv("SELECTION_MAX_USERS", "10000"))
+SELECTION_TTL = float(os.getenv("SELECTION_TTL", "3600"))  # Idle seconds before a selection is forgotten
+
+
+class Selection:
+    __slots__ = ("country", "touched")
+
+    def __init__(self, country, touched):
+        self.country = country
+        self.touched = touched
+
+
+class SelectionStore:
+    """Per-user country selections with LRU eviction and an idle TTL."""
+
+    def __init__(self, max_size=SELECTION_MAX_USERS, ttl=SELECTION_TTL, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        # Ordered least to most recently used, which is also oldest to newest touch
+        self._entries = OrderedDict()
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, user_id):
+        return self.get(user_id) is not None
+
+    def get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        now = self.clock()
+        if now - entry.touched > self.ttl:
+            del self._entries[user_id]
+            self.expirations += 1
+            return None
+        entry.touched = now
+        self._entries.move_to_end(user_id)
+        return entry.country
+
+    def set(self, user_id, country):
+        now = self.clock()
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            entry.country = country
+            entry.touched = now
+            self._entries.move_to_end(user_id)
+            return
+        self._expire(now)
+        while len(self._entries) >= self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._entries[user_id] = Selection(country, now)
+
+    def _expire(self, now):
+        entries = self._entries
+        while entries:
+            user_id, entry = next(iter(entries.items()))
+            if now - entry.touched <= self.ttl:
+                break
+            del entries[user_id]
+            self.expirations += 1
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
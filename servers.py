@@ -0,0 +1,102 @@
+from collections import namedtuple
+from types import MappingProxyType
+
+
+class Server(namedtuple("Server", ["country", "index", "ip", "port", "x", "y", "number"])):
+    __slots__ = ()
+
+    @property
+    def key(self):
+        return (self.ip, self.port)
+
+
+# Placeholder used for servers without a public number (e.g. piscataway event maps)
+NO_NUMBER = "null"
+
+_REQUIRED_FIELDS = ("ip", "port", "x", "y", "number")
+
+
+class ServerRegistry:
+    """Read-only view of country_to_ip with aliases resolved and lookup indexes built once."""
+
+    def __init__(self, country_to_ip):
+        aliases = {}
+        servers = {}
+        for name, value in country_to_ip.items():
+            if isinstance(value, str):
+                aliases[name] = value
+            elif isinstance(value, list):
+                servers[name] = value
+            else:
+                raise ValueError(f"Invalid entry for {name!r}: expected a server list or an alias string")
+
+        for alias, target in aliases.items():
+            if target not in servers:
+                raise ValueError(f"Alias {alias!r} points to unknown country {target!r}")
+
+        by_country = {}
+        by_key = {}
+        by_number = {}
+        by_country_number = {}
+        for country, entries in servers.items():
+            if not entries:
+                raise ValueError(f"Country {country!r} has no servers")
+            country_servers = []
+            numbers = {}
+            for index, entry in enumerate(entries, 1):
+                missing = [field for field in _REQUIRED_FIELDS if field not in entry]
+                if missing:
+                    raise ValueError(f"Server {index} in {country!r} is missing {', '.join(missing)}")
+                server = Server(country, index, entry["ip"], str(entry["port"]), entry["x"], entry["y"], str(entry["number"]))
+                if server.key in by_key:
+                    raise ValueError(f"Duplicate server {server.ip}:{server.port} in {country!r}")
+                by_key[server.key] = server
+                country_servers.append(server)
+
+                if server.number == NO_NUMBER:
+                    continue  # Only selectable by index
+                if server.number in by_number:
+                    raise ValueError(f"Duplicate server number {server.number} in {country!r}")
+                by_number[server.number] = server
+                numbers[server.number] = server
+
+            by_country[country] = tuple(country_servers)
+            by_country_number[country] = MappingProxyType(numbers)
+
+        self.countries = tuple(servers)
+        self.aliases = MappingProxyType(aliases)
+        self._by_country = MappingProxyType(by_country)
+        self._by_key = MappingProxyType(by_key)
+        self._by_number = MappingProxyType(by_number)
+        self._by_country_number = MappingProxyType(by_country_number)
+
+    def resolve(self, name):
+        name = name.strip().lower()
+        if name in self._by_country:
+            return name
+        return self.aliases.get(name)
+
+    def servers(self, country):
+        return self._by_country.get(country, ())
+
+    def all_servers(self):
+        return self._by_key.values()
+
+    def by_key(self, ip, port):
+        return self._by_key.get((ip, str(port)))
+
+    def by_number(self, number, country=None):
+        if country is None:
+            return self._by_number.get(number)
+        return self._by_country_number.get(country, {}).get(number)
+
+    def select(self, country, selection):
+        """Match a #select argument by server number first, then by 1-based index."""
+        server = self.by_number(selection, country)
+        if server is not None:
+            return server
+        servers = self.servers(country)
+        index = int(selection) - 1
+        if 0 <= index < len(servers):
+            return servers[index]
+        return None
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import os
+import struct
+import time
+import zlib
+from multiprocessing import shared_memory
+
+from leaderboard import LeaderboardError
+
+try:
+    import orjson
+    _dumps = orjson.dumps
+except ImportError:  # orjson is in requirements.txt; the stdlib encoder covers installs without it
+    import json
+
+    def _dumps(obj):
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+logger = logging.getLogger('SlitherBot')
+
+SNAPSHOT_SHM_SIZE = int(os.getenv("SNAPSHOT_SHM_SIZE", str(16 * 1024 * 1024)))  # Bytes for both snapshot slots
+SNAPSHOT_SHM_CHECK = float(os.getenv("SNAPSHOT_SHM_CHECK", "0.25"))  # Seconds between checks for a new publish
+
+_MAGIC = b"SLS1"
+_HEADER = struct.Struct("<4sQQIId")  # magic, sequence, snapshot version, body length, body crc32, publish time
+_HEADER_SIZE = 64
+_SEQUENCE = struct.Struct("<Q")
+_READ_RETRIES = 10
+
+
+def encode_payload(snapshot):
+    """Encode a snapshot in the upstream API's shape, so readers reuse parse_snapshot unchanged."""
+    return _dumps({"dataList": [
+        {
+            "ipv4": board.ipv4,
+            "po": board.port,
+            "snakeCount": board.snake_count,
+            "leaderboard": [{"nk": e.nk, "len": e.len, "place": e.place} for e in board.entries],
+        }
+        for board in snapshot.servers.values()
+    ]})
+
+
+class SharedSnapshot:
+    """Latest leaderboard snapshot in a shared memory segment, written by one process and read by many.
+
+    The segment holds a header and two slots. The writer fills the slot readers
+    are not using, then flips the header under a sequence counter that is odd
+    while the flip is in progress (a seqlock). A reader copies the body and
+    retries if the sequence moved or the crc does not match.
+    """
+
+    def __init__(self, shm, owner):
+        self.shm = shm
+        self.owner = owner
+        self.slot_size = (shm.size - _HEADER_SIZE) // 2
+        self.publishes = 0
+        self.reads = 0
+        self.retries = 0
+
+    @classmethod
+    def create(cls, size=SNAPSHOT_SHM_SIZE):
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        _HEADER.pack_into(shm.buf, 0, _MAGIC, 0, 0, 0, 0, 0.0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            # Only the creating process unlinks the segment
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:  # Before Python 3.13; spawned workers share the supervisor's resource tracker
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, owner=False)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def sequence(self):
+        return _SEQUENCE.unpack_from(self.shm.buf, 4)[0]
+
+    def publish(self, snapshot):
+        body = encode_payload(snapshot)
+        if len(body) > self.slot_size:
+            logger.error(f"Snapshot v{snapshot.version} is {len(body)} bytes, larger than the {self.slot_size} byte shared slot; raise SNAPSHOT_SHM_SIZE")
+            return
+        buf = self.shm.buf
+        sequence = self.sequence()
+        publish = sequence // 2 + 1
+        offset = _HEADER_SIZE + (publish % 2) * self.slot_size
+        buf[offset:offset + len(body)] = body
+        _SEQUENCE.pack_into(buf, 4, sequence + 1)
+        _HEADER.pack_into(buf, 0, _MAGIC, sequence + 1, snapshot.version, len(body), zlib.crc32(body), time.time())
+        _SEQUENCE.pack_into(buf, 4, sequence + 2)
+        self.publishes += 1
+
+    def read(self):
+        """Return (sequence, version, published_at, body) for the latest publish, or None before the first one."""
+        buf = self.shm.buf
+        for _ in range(_READ_RETRIES):
+            magic, sequence, version, length, crc, published_at = _HEADER.unpack_from(buf, 0)
+            if magic != _MAGIC:
+                raise LeaderboardError("Shared snapshot segment is not initialized")
+            if sequence == 0:
+                return None
+            if sequence % 2 == 0:
+                offset = _HEADER_SIZE + (sequence // 2 % 2) * self.slot_size
+                body = bytes(buf[offset:offset + length])
+                if self.sequence() == sequence and zlib.crc32(body) == crc:
+                    self.reads += 1
+                    return sequence, version, published_at, body
+            self.retries += 1
+            time.sleep(0)
+        raise LeaderboardError("Shared snapshot kept changing while being read")
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedSnapshotClient:
+    """Stands in for LeaderboardClient in worker processes: "fetching" reads the latest shared snapshot."""
+
+    def __init__(self, shared):
+        self.shared = shared
+        self.sequence = 0
+        self.published_at = None
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        self.shared.close()
+
+    async def fetch(self):
+        latest = self.shared.read()
+        if latest is None:
+            raise LeaderboardError("No leaderboard snapshot has been published yet")
+        self.sequence, _, self.published_at, body = latest
+        return body
+
+    def stats(self):
+        return {
+            "segment": self.shared.name,
+            "sequence": self.sequence,
+            "published_age": round(time.time() - self.published_at, 3) if self.published_at else None,
+            "reads": self.shared.reads,
+            "retries": self.shared.retries,
+        }
+
+
+async def follow_shared_snapshots(cache, client, interval=SNAPSHOT_SHM_CHECK):
+    """Refresh the cache whenever the fetcher publishes; checking is one 8-byte read."""
+    while True:
+        sequence = client.shared.sequence()
+        if sequence and sequence % 2 == 0 and sequence != client.sequence:
+            try:
+                await cache.refresh()
+            except LeaderboardError:
+                pass  # Already logged by the cache; retried on the next check
+            except Exception:
+                logger.exception("Shared snapshot refresh failed")
+        await asyncio.sleep(interval)
@@ -1,27 +1,62 @@
-fetch("https://slither-realtime-leaderboard.pages.dev/api/leaderboard")
-  .then(res => res.json())
-  .then(data => {
-    const container = document.getElementById("servers");
-    data.dataList.forEach(server => {
-      const card = document.createElement("div");
-      card.className = "server-card";
-
-      const header = document.createElement("div");
-      header.className = "server-header";
-      header.innerText = `Server: ${server.ipv4}:${server.po} | Snakes: ${server.snakeCount}`;
-      card.appendChild(header);
-
-      server.leaderboard?.slice(0, 5).forEach(p => {
-        const div = document.createElement("div");
-        div.className = "player";
-        div.innerHTML = `<span>${p.place}. ${p.nk}</span><span>Score: ${p.len}</span>`;
-        card.appendChild(div);
-      });
-
-      container.appendChild(card);
-    });
-  })
-  .catch(err => {
-    document.getElementById("servers").innerText = "Failed to load leaderboard data.";
-    console.log("Leaderboard loaded. This is a static file. Run the bot again to update data.");
-  });
\ No newline at end of file
+// Live leaderboard: one full snapshot on connect, then only the servers that changed
+const container = document.getElementById("servers");
+const cards = new Map();
+
+function renderCard(id, server) {
+  let card = cards.get(id);
+  if (!card) {
+    card = document.createElement("div");
+    card.className = "server-card";
+    cards.set(id, card);
+    container.appendChild(card);
+  }
+  card.replaceChildren();
+
+  const header = document.createElement("div");
+  header.className = "server-header";
+  header.innerText = `Server: ${id} | Snakes: ${server.snakeCount}`;
+  card.appendChild(header);
+
+  server.leaderboard.slice(0, 5).forEach(p => {
+    const div = document.createElement("div");
+    div.className = "player";
+    const name = document.createElement("span");
+    name.innerText = `${p.place}. ${p.nk}`;
+    const score = document.createElement("span");
+    score.innerText = `Score: ${p.len}`;
+    div.append(name, score);
+    card.appendChild(div);
+  });
+}
+
+function removeCard(id) {
+  const card = cards.get(id);
+  if (card) {
+    card.remove();
+    cards.delete(id);
+  }
+}
+
+if (container) {
+  const stream = new EventSource("/live/stream");
+
+  stream.addEventListener("snapshot", event => {
+    const data = JSON.parse(event.data);
+    if (cards.size === 0) container.replaceChildren();  // Drop any error message
+    for (const id of [...cards.keys()]) {
+      if (!(id in data.servers)) removeCard(id);
+    }
+    for (const [id, server] of Object.entries(data.servers)) renderCard(id, server);
+  });
+
+  stream.addEventListener("diff", event => {
+    const data = JSON.parse(event.data);
+    for (const [id, server] of Object.entries(data.changed)) renderCard(id, server);
+    data.removed.forEach(removeCard);
+  });
+
+  stream.onerror = () => {
+    // EventSource reconnects on its own and receives a fresh snapshot
+    if (cards.size === 0) container.innerText = "Failed to load leaderboard data.";
+  };
+}
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from httputil import Page, accepted_encodings  # noqa: E402
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, br", {"gzip", "br"}),
+    ("gzip;q=0, br", {"br"}),
+    ("gzip; q=0.5, br;q=0", {"gzip"}),
+    ("GZIP;Q=0.0", set()),
+    ("gzip;q=bogus, identity", {"identity"}),
+])
+def test_accepted_encodings_drops_refused_codings(header, expected):
+    assert accepted_encodings(header) == expected
+
+
+def test_page_is_not_gzipped_for_a_client_that_refuses_gzip():
+    page = Page("x" * 4096)
+    assert page.encoded("gzip;q=0")[0] is None
+    assert page.encoded("gzip;q=0.8")[0] == "gzip"
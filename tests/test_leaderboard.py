@@ -0,0 +1,51 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import LeaderboardCache, LeaderboardFormatError, parse_snapshot, poll_leaderboard  # noqa: E402
+
+
+@pytest.mark.parametrize("payload", [
+    b'{"dataList":[null, 5, "x"]}',
+    b'{"dataList":[{"ipv4":"1.2.3.4","po":444,"leaderboard":{"nk":"a"}}]}',
+    b'{"dataList":[{"ipv4":"1.2.3.4","po":444,"leaderboard":[null, 3]}]}',
+])
+def test_parse_snapshot_skips_malformed_records(payload):
+    snapshot = parse_snapshot(payload)
+    assert all(board.entries == () for board in snapshot.servers.values())
+
+
+def test_parse_snapshot_keeps_good_entries_next_to_bad_ones():
+    snapshot = parse_snapshot(b'{"dataList":[null,{"ipv4":"1.2.3.4","po":444,"snakeCount":7,'
+                              b'"leaderboard":[null,{"nk":"a","len":5,"place":1}]}]}')
+    assert snapshot.get("1.2.3.4", 444).top() == (("a", 5, 1),)
+
+
+def test_parse_snapshot_reports_unusable_records_as_format_errors():
+    with pytest.raises(LeaderboardFormatError):
+        parse_snapshot(b'{"dataList":[{"ipv4":["1.2.3.4"],"po":444}]}')
+
+
+def test_poller_survives_unexpected_errors():
+    class Client:
+        calls = 0
+
+        async def fetch(self):
+            self.calls += 1
+            if self.calls == 1:
+                raise RuntimeError("boom")
+            return b'{"dataList":[]}'
+
+    async def scenario():
+        cache = LeaderboardCache(Client())
+        poller = asyncio.create_task(poll_leaderboard(cache, 0.01))
+        await asyncio.sleep(0.1)
+        assert not poller.done()
+        poller.cancel()
+        assert cache.version >= 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import Entry, ServerBoard, Snapshot  # noqa: E402
+from persist import SnapshotStore  # noqa: E402
+
+
+def make_snapshot(version, snake_count):
+    board = ServerBoard("1.2.3.4", "444", snake_count, (Entry("snake", 100, 1),))
+    return Snapshot(version, None, {("1.2.3.4", "444"): board})
+
+
+def test_new_snapshots_survive_unreadable_files_with_higher_versions(tmp_path):
+    for version in (50, 51, 52):
+        with open(tmp_path / f"snapshot-{version:012d}.bin", "wb") as f:
+            f.write(b"not a snapshot")
+        os.utime(tmp_path / f"snapshot-{version:012d}.bin", ns=(1, 1))
+    store = SnapshotStore(directory=str(tmp_path), keep=3)
+    snapshot, _ = store.load()
+    assert snapshot is None
+
+    # With no readable snapshot the cache starts over at version 1
+    store._write_snapshot(make_snapshot(1, 10))
+    store._write_snapshot(make_snapshot(2, 20))
+
+    assert sorted(os.listdir(tmp_path)) == [
+        "snapshot-000000000001.bin", "snapshot-000000000002.bin", "snapshot-000000000052.bin",
+    ]
+    snapshot, _ = SnapshotStore(directory=str(tmp_path)).load()
+    assert snapshot.version == 2
+    assert snapshot.get("1.2.3.4", 444).snake_count == 20
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from leaderboard import ServerBoard, Snapshot  # noqa: E402
+from probe import LatencyProber, tcp_connect  # noqa: E402
+from servers import Server  # noqa: E402
+
+
+def make_server(port, number="1"):
+    return Server("local", 1, "127.0.0.1", str(port), "0%", "0%", number)
+
+
+async def start_listeners(count):
+    async def accept(reader, writer):
+        writer.close()
+
+    listeners = [await asyncio.start_server(accept, "127.0.0.1", 0) for _ in range(count)]
+    ports = [listener.sockets[0].getsockname()[1] for listener in listeners]
+    return listeners, ports
+
+
+async def close_listeners(listeners):
+    for listener in listeners:
+        listener.close()
+        await listener.wait_closed()
+
+
+def delayed_connect(delays, calls=None, inflight=None):
+    """A connect hook that adds a per-port delay before a real TCP connect."""
+    async def connect(host, port, timeout):
+        if calls is not None:
+            calls.append(port)
+        if inflight is not None:
+            inflight["now"] += 1
+            inflight["max"] = max(inflight["max"], inflight["now"])
+        try:
+            await asyncio.sleep(delays.get(int(port), 0))
+            await tcp_connect(host, port, timeout)
+        finally:
+            if inflight is not None:
+                inflight["now"] -= 1
+    return connect
+
+
+def test_rank_orders_by_rtt_then_snake_count_and_puts_unreachable_last():
+    async def scenario():
+        listeners, (slow, quiet, busy) = await start_listeners(3)
+        closed_listeners, (closed,) = await start_listeners(1)
+        await close_listeners(closed_listeners)  # Nothing listens on this port any more
+        try:
+            prober = LatencyProber(connect=delayed_connect({slow: 0.2}), timeout=1)
+            servers = [make_server(port) for port in (closed, slow, quiet, busy)]
+            snapshot = Snapshot(1, None, {
+                ("127.0.0.1", str(quiet)): ServerBoard("127.0.0.1", str(quiet), 10, ()),
+                ("127.0.0.1", str(busy)): ServerBoard("127.0.0.1", str(busy), 300, ()),
+            })
+            await prober.probe(servers)
+            ranked = prober.rank(servers, snapshot)
+            assert [int(server.port) for server, _, _ in ranked] == [busy, quiet, slow, closed]
+            assert ranked[-1][1].loss() == 1.0
+            assert ranked[2][1].percentile(0.5) >= 0.2
+            assert prober.failures == 1
+        finally:
+            await close_listeners(listeners)
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_cap_limits_connects_in_flight():
+    async def scenario():
+        listeners, ports = await start_listeners(6)
+        try:
+            inflight = {"now": 0, "max": 0}
+            prober = LatencyProber(connect=delayed_connect({port: 0.05 for port in ports}, inflight=inflight),
+                                   concurrency=2)
+            await prober.probe([make_server(port) for port in ports])
+            assert inflight["max"] == 2
+            assert prober.probes == 6
+        finally:
+            await close_listeners(listeners)
+
+    asyncio.run(scenario())
+
+
+def test_ensure_fresh_reuses_results_within_ttl():
+    async def scenario():
+        listeners, (port,) = await start_listeners(1)
+        try:
+            now = [0.0]
+            calls = []
+            prober = LatencyProber(connect=delayed_connect({}, calls=calls), ttl=60, clock=lambda: now[0])
+            servers = [make_server(port)]
+            await prober.ensure_fresh(servers)
+            now[0] = 59
+            await prober.ensure_fresh(servers)
+            assert len(calls) == 1
+            now[0] = 61
+            await prober.ensure_fresh(servers)
+            assert len(calls) == 2
+        finally:
+            await close_listeners(listeners)
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_probes_of_one_endpoint_share_a_connect():
+    async def scenario():
+        listeners, (port,) = await start_listeners(1)
+        try:
+            calls = []
+            prober = LatencyProber(connect=delayed_connect({port: 0.05}, calls=calls))
+            server = make_server(port)
+            await asyncio.gather(*(prober.probe_one(server) for _ in range(5)))
+            assert len(calls) == 1
+            assert len(prober.endpoint(server.key).rtts) == 1
+            assert prober.stats()["inflight"] == 0
+        finally:
+            await close_listeners(listeners)
+
+    asyncio.run(scenario())
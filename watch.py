@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import os
+
+import discord
+
+logger = logging.getLogger('SlitherBot')
+
+WATCH_GUILD_LIMIT = int(os.getenv("WATCH_GUILD_LIMIT", "10"))  # Active watches allowed per guild
+
+
+class Watch:
+    __slots__ = ("channel_id", "guild_id", "server", "message", "latest", "task")
+
+    def __init__(self, channel_id, guild_id, server, message):
+        self.channel_id = channel_id
+        self.guild_id = guild_id
+        self.server = server
+        self.message = message
+        self.latest = None
+        self.task = None
+
+
+class WatchError(Exception):
+    pass
+
+
+class WatchManager:
+    """Keeps one pinned, self-updating leaderboard message per watched (channel, server).
+
+    Driven by the shared snapshot poller: every refresh compares each watched
+    server's top entries with what was last posted and edits the watching
+    messages only when they changed.
+    """
+
+    def __init__(self, cache, renderer, outbox, guild_limit=WATCH_GUILD_LIMIT):
+        self.cache = cache
+        self.renderer = renderer
+        self.outbox = outbox
+        self.guild_limit = guild_limit
+        self._by_server = {}  # server key -> {channel id: Watch}
+        self._by_channel = {}  # channel id -> {server key: Watch}
+        self._guild_counts = {}
+        self._last_top = {}  # server key -> top entries last posted
+        self.updates = 0
+        self.failures = 0
+        cache.add_listener(self.on_snapshot)
+
+    def __len__(self):
+        return sum(len(watches) for watches in self._by_channel.values())
+
+    def is_watching(self, channel_id, server):
+        return server.key in self._by_channel.get(channel_id, {})
+
+    def watch_text(self, server, snapshot):
+        board = snapshot.get(server.ip, server.port) if snapshot is not None else None
+        header = f"👀 Watching server {server.number} - this message updates when the top 10 changes."
+        if board is None:
+            return f"{header}\nNo leaderboard data for `{server.ip}:{server.port}` yet."
+        return f"{header}\n{self.renderer.leaderboard(server, board, snapshot.version).discord}"
+
+    async def add(self, channel, guild_id, server, snapshot):
+        if self.is_watching(channel.id, server):
+            raise WatchError(f"This channel is already watching server {server.number}.")
+        if self._guild_counts.get(guild_id, 0) >= self.guild_limit:
+            raise WatchError(f"This server already has {self.guild_limit} active watches. Use `#unwatch` to remove one.")
+
+        # Reserve the slot before the first await, so concurrent #watch commands see it
+        watch = Watch(channel.id, guild_id, server, None)
+        self._by_server.setdefault(server.key, {})[channel.id] = watch
+        self._by_channel.setdefault(channel.id, {})[server.key] = watch
+        self._guild_counts[guild_id] = self._guild_counts.get(guild_id, 0) + 1
+        if snapshot is not None and server.key not in self._last_top:
+            board = snapshot.get(server.ip, server.port)
+            self._last_top[server.key] = board.top() if board is not None else None
+
+        try:
+            watch.message = await self.outbox.send(channel, self.watch_text(server, snapshot))
+        except BaseException:
+            self._drop(watch)
+            raise
+        if not self._is_registered(watch):
+            return watch  # Unwatched while the message was being sent
+        try:
+            await watch.message.pin()
+            if not self._is_registered(watch):
+                await watch.message.unpin()  # #unwatch ran while the pin was in flight
+                return watch
+        except discord.HTTPException as e:
+            logger.warning(f"Could not pin watch message in channel {channel.id}: {str(e)}")
+        if watch.latest is not None and watch.task is None:
+            # A snapshot landed while the message was being sent
+            watch.task = asyncio.ensure_future(self._flush(watch))
+        return watch
+
+    def _is_registered(self, watch):
+        return self._by_channel.get(watch.channel_id, {}).get(watch.server.key) is watch
+
+    async def remove(self, channel_id, server=None):
+        """Stop watching one server (or every server when None) in a channel; returns the removed watches."""
+        watches = self._by_channel.get(channel_id, {})
+        keys = list(watches) if server is None else [server.key] if server.key in watches else []
+        removed = [self._drop(watches[key]) for key in keys]
+        for watch in removed:
+            if watch.message is None:
+                continue  # Its message is still being sent; add() leaves it unpinned
+            try:
+                await watch.message.unpin()
+            except discord.HTTPException:
+                pass  # Already unpinned, deleted or missing permissions
+        return removed
+
+    def _drop(self, watch):
+        if not self._is_registered(watch):
+            return watch  # Already dropped, e.g. by #unwatch while an edit was failing
+        key = watch.server.key
+        self._by_channel.get(watch.channel_id, {}).pop(key, None)
+        if not self._by_channel.get(watch.channel_id):
+            self._by_channel.pop(watch.channel_id, None)
+        server_watches = self._by_server.get(key, {})
+        server_watches.pop(watch.channel_id, None)
+        if not server_watches:
+            self._by_server.pop(key, None)
+            self._last_top.pop(key, None)
+        self._guild_counts[watch.guild_id] -= 1
+        if not self._guild_counts[watch.guild_id]:
+            del self._guild_counts[watch.guild_id]
+        if watch.task is not None:
+            watch.task.cancel()
+        return watch
+
+    def on_snapshot(self, old, new):
+        # Only watched servers are compared, so the cost scales with watched servers, not subscriptions
+        for key, watches in self._by_server.items():
+            board = new.servers.get(key)
+            if board is None:
+                continue
+            top = board.top()
+            if self._last_top.get(key) == top:
+                continue
+            self._last_top[key] = top
+
+            # Rendered once per server, shared by every channel watching it
+            text = self.watch_text(next(iter(watches.values())).server, new)
+            for watch in watches.values():
+                watch.latest = text
+                if watch.task is None and watch.message is not None:
+                    watch.task = asyncio.ensure_future(self._flush(watch))
+
+    async def _flush(self, watch):
+        try:
+            # Newer snapshots that land while an edit waits on the rate limiter replace the queued text
+            while True:
+                text = watch.latest
+                await self.outbox.edit(watch.message, text)
+                self.updates += 1
+                if watch.latest is text:
+                    break
+        except (discord.NotFound, discord.Forbidden) as e:
+            self.failures += 1
+            logger.warning(f"Dropping watch on {watch.server.ip}:{watch.server.port} in channel {watch.channel_id}: {str(e)}")
+            watch.task = None
+            self._drop(watch)
+        except discord.HTTPException as e:
+            self.failures += 1
+            logger.error(f"Failed to update watch in channel {watch.channel_id}: {str(e)}")
+        finally:
+            watch.task = None
+
+    def stats(self):
+        return {
+            "watches": len(self),
+            "channels": len(self._by_channel),
+            "servers": len(self._by_server),
+            "updates": self.updates,
+            "failures": self.failures,
+        }